@@ -1,39 +1,240 @@
 #!/usr/bin/env python3
 from __future__ import annotations
 
+import hashlib
+import hmac
 import os
+import re
 from pathlib import Path
 import io
+import json
+import threading
+import time
 import zipfile
-from typing import Any, Dict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Optional
 
-from flask import Flask, jsonify, request, send_file
+from flask import Flask, Response, g, jsonify, request, send_file, stream_with_context
 from flask import send_from_directory
 import datetime as dt
 
+
+from config import get_settings, on_reload, reload_settings
 from piano_lib import (
     DEFAULT_BASE_URL,
+    CircuitOpenError,
+    DeadlineExceeded,
+    UpstreamAuthError,
+    breaker_status,
     build_all_csvs,
     build_action_cards_csvs,
-    fetch_conversion_report,
+    build_pivot_cube,
+    configure_breaker,
+    decode_report,
+    encode_rows_columnar,
+    fetch_conversion_report_chunked,
+    fetch_conversion_report_hedged,
+    guarded_get,
+    prune_cache,
+    query_pivot_cube,
+    set_upstream_limit,
+    token_key,
 )
 from brands import BRAND_TO_AID, resolve_aid
+from experience_index import ExperienceIndex
+from profiling import list_sessions, parse_modes, propagate, stage, start_session
 
 app = Flask(__name__, static_url_path="", static_folder="static")
 # Simple in-memory cache for trends slice aggregates
 _SLICE_CACHE: Dict[tuple, tuple[float, dict]] = {}
-_CACHE_TTL_SECONDS = int(os.environ.get("TRENDS_CACHE_TTL", "300"))  # 5 minutes default
+# Pivot cubes per report: (base_url, exp_id, aid, from, to) -> (built_at, cube); bounded by _PIVOT_CACHE_MAX
+_PIVOT_CACHE: Dict[tuple, tuple[float, dict]] = {}
+_PIVOT_CACHE_MAX = 64
+# Searchable index over every experience list this process has fetched
+_EXPERIENCE_INDEX = ExperienceIndex()
+# Settings (env + .env) are loaded once here; handlers only read attributes.
+# TRENDS_CACHE_TTL, REPORT_CHUNKING and PIANO_UPSTREAM_CONCURRENCY live in config.py.
+_settings = get_settings()
+
+
+@on_reload
+def _apply_settings(settings) -> None:
+    global _settings
+    _settings = settings
+    set_upstream_limit(settings.upstream_concurrency)
+    configure_breaker(failures=settings.breaker_failures, cooldown=settings.breaker_cooldown, auth_cooldown=settings.auth_cooldown)
+
+
+_apply_settings(_settings)
+
+
+def _upstream_error(exc: Exception, prefix: str = ""):
+    """Map an upstream failure to (json, status) so the UI can tell auth/circuit/deadline apart."""
+    msg = f"{prefix}{exc}"
+    if isinstance(exc, UpstreamAuthError):
+        resp = jsonify({"error": msg, "tokenInvalid": True, "retryAfter": round(exc.retry_after)})
+        return resp, 401
+    if isinstance(exc, CircuitOpenError):
+        resp = jsonify({"error": msg, "circuitOpen": True, "retryAfter": round(exc.retry_after)})
+        resp.headers["Retry-After"] = str(max(1, round(exc.retry_after)))
+        return resp, 503
+    if isinstance(exc, DeadlineExceeded):
+        return jsonify({"error": msg, "deadlineExceeded": True}), 504
+    return jsonify({"error": msg}), 502
+
+
+def _request_budget(body: Dict[str, Any]) -> float:
+    """Seconds of budget: REQUEST_DEADLINE_SECONDS, shortened (never extended) by body.deadlineMs."""
+    budget = _settings.request_deadline
+    try:
+        if body.get("deadlineMs"):
+            budget = min(budget, float(body["deadlineMs"]) / 1000.0)
+    except (TypeError, ValueError):
+        pass
+    return budget
+
+
+def _request_deadline(body: Dict[str, Any]) -> float:
+    """Absolute time.monotonic() deadline for this request (see _request_budget)."""
+    return time.monotonic() + _request_budget(body)
+
+
+_ROOT = Path(__file__).resolve().parent
+_STATIC_DIR = _ROOT / "static"
+_EXTENSION_DIR = _ROOT / "extension"
+_IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+# Build products keyed by a (path, mtime, size) signature of their inputs, rebuilt on change
+_BUILD_LOCK = threading.Lock()
+_ASSET_HASHES: Dict[str, tuple[tuple, str]] = {}
+_INDEX_HTML: Dict[str, Any] = {}
+_EXTENSION_ZIP: Dict[str, Any] = {}
+# Assets referenced from index.html that get fingerprinted URLs
+_FINGERPRINTED_ASSETS = ("styles.css", "script.js")
+
+
+def _file_sig(paths) -> tuple:
+    sig = []
+    for path in paths:
+        st = path.stat()
+        sig.append((str(path), st.st_mtime_ns, st.st_size))
+    return tuple(sig)
+
+
+def _asset_hash(name: str) -> str:
+    """Short content hash of a static file, recomputed only when it changes."""
+    path = _STATIC_DIR / name
+    sig = _file_sig([path])
+    cached = _ASSET_HASHES.get(name)
+    if cached and cached[0] == sig:
+        return cached[1]
+    digest = hashlib.sha256(path.read_bytes()).hexdigest()[:12]
+    _ASSET_HASHES[name] = (sig, digest)
+    return digest
+
+
+def _index_html() -> tuple[str, str]:
+    """index.html with fingerprinted asset URLs, plus its ETag."""
+    paths = [_STATIC_DIR / "index.html"] + [_STATIC_DIR / n for n in _FINGERPRINTED_ASSETS]
+    sig = _file_sig(paths)
+    if _INDEX_HTML.get("sig") == sig:
+        return _INDEX_HTML["html"], _INDEX_HTML["etag"]
+    with _BUILD_LOCK:
+        html = paths[0].read_text(encoding="utf-8")
+        for name in _FINGERPRINTED_ASSETS:
+            html = re.sub(rf'(["\'])/{re.escape(name)}\1', rf'\1/{name}?v={_asset_hash(name)}\1', html)
+        etag = hashlib.sha256(html.encode("utf-8")).hexdigest()[:16]
+        _INDEX_HTML.update({"sig": sig, "html": html, "etag": etag})
+    return html, etag
+
+
+def _extension_zip() -> Optional[tuple[bytes, str]]:
+    """Zip of extension/ and its content-hash ETag, rebuilt only when a file changes."""
+    if not _EXTENSION_DIR.exists():
+        return None
+    files = sorted(p for p in _EXTENSION_DIR.rglob("*") if p.is_file())
+    sig = _file_sig(files)
+    if _EXTENSION_ZIP.get("sig") == sig:
+        return _EXTENSION_ZIP["data"], _EXTENSION_ZIP["etag"]
+    with _BUILD_LOCK:
+        buf = io.BytesIO()
+        with zipfile.ZipFile(buf, mode="w", compression=zipfile.ZIP_DEFLATED) as zf:
+            for path in files:
+                # Fixed timestamps keep the bytes (and so the ETag) stable across rebuilds
+                info = zipfile.ZipInfo(str(path.relative_to(_EXTENSION_DIR)), date_time=(1980, 1, 1, 0, 0, 0))
+                info.compress_type = zipfile.ZIP_DEFLATED
+                zf.writestr(info, path.read_bytes())
+        data = buf.getvalue()
+        etag = hashlib.sha256(data).hexdigest()
+        _EXTENSION_ZIP.update({"sig": sig, "data": data, "etag": etag})
+    return data, etag
+
+
+@app.after_request
+def _static_cache_headers(resp):
+    """Fingerprinted asset URLs are immutable; everything else must revalidate."""
+    name = request.path.lstrip("/")
+    if request.method == "GET" and name in _FINGERPRINTED_ASSETS and resp.status_code in (200, 304):
+        version = request.args.get("v")
+        if version and version == _asset_hash(name):
+            resp.headers["Cache-Control"] = f"public, max-age={_IMMUTABLE_MAX_AGE}, immutable"
+        else:
+            resp.headers["Cache-Control"] = "no-cache"
+    return resp
+
+
+_PROFILE_ARTIFACT_RE = re.compile(r"^[\w-]+\.(json|prof|collapsed|tracemalloc)$")
+
+
+def _admin_denied():
+    """None if the request carries the admin token, else the 404/403 response to return."""
+    if not _settings.admin_token:
+        return jsonify({"error": "Not found"}), 404
+    supplied = request.headers.get("X-Admin-Token") or ""
+    if not hmac.compare_digest(supplied.encode(), _settings.admin_token.encode()):
+        return jsonify({"error": "Forbidden"}), 403
+    return None
+
+
+@app.before_request
+def _start_profile():
+    """Profile this request when an admin sends X-Profile (cprofile, sample and/or tracemalloc)."""
+    raw = request.headers.get("X-Profile")
+    if not raw or not _settings.profiling or _admin_denied() is not None:
+        return None
+    modes = parse_modes(raw)
+    if modes is None:
+        g.profile_status = "bad-mode"
+        return None
+    g.profile = start_session(modes=modes, out_dir=Path(_settings.profile_dir), label=f"{request.method} {request.path}")
+    g.profile_status = "on" if g.profile else "busy"
+    return None
+
+
+@app.after_request
+def _finish_profile(resp):
+    """Report the profile id and stop profiling once the body (streamed or not) has been sent."""
+    status = g.pop("profile_status", None)
+    if status:
+        resp.headers["X-Profile-Status"] = status
+    session = g.pop("profile", None)
+    if session is not None:
+        resp.headers["X-Profile-Id"] = session.id
+        resp.call_on_close(session.finish)
+    return resp
 
 
 @app.get("/")
 def index():
-    return app.send_static_file("index.html")
+    html, etag = _index_html()
+    resp = app.response_class(html, mimetype="text/html")
+    resp.set_etag(etag)
+    resp.headers["Cache-Control"] = "no-cache"
+    return resp.make_conditional(request)
 
 @app.get("/sampleData.json")
 def sample_data():
     # Serve sampleData.json from project root to support the UI's "Load sample" button
-    root = Path(__file__).resolve().parent
-    return send_from_directory(directory=str(root), path="sampleData.json", mimetype="application/json")
+    return send_from_directory(directory=str(_ROOT), path="sampleData.json", mimetype="application/json")
 
 @app.get("/api/brands")
 def api_brands():
@@ -43,47 +244,151 @@ def api_brands():
 @app.post("/api/report")
 def api_report():
     body: Dict[str, Any] = request.get_json(silent=True) or {}
-    exp_id = body.get("expId") or os.environ.get("PIANO_EXP_ID", "EXCTYT87DM0F")
+    exp_id = body.get("expId") or _settings.exp_id
     # Resolve AID from brand if provided; otherwise fall back to explicit aid or env var
     brand = body.get("brand")
-    aid = resolve_aid(brand) or body.get("aid") or os.environ.get("PIANO_AID", "N8sydUSDcX")
+    aid = resolve_aid(brand) or body.get("aid") or _settings.aid
     locale = "en_US"
     from_date = body.get("from")
     to_date = body.get("to")
     base_url = body.get("baseUrl") or DEFAULT_BASE_URL
 
     # Bearer can be passed in body or use env var
-    bearer = body.get("bearer") or os.environ.get("PIANO_BEARER")
+    bearer = body.get("bearer") or _settings.bearer
     if not bearer:
         return jsonify({"error": "Missing bearer token"}), 400
 
+    deadline = _request_deadline(body)
     try:
-        data = fetch_conversion_report(
-            base_url=base_url,
-            exp_id=exp_id,
-            aid=aid,
-            locale=locale,
-            from_date=from_date,
-            to_date=to_date,
-            bearer=bearer,
-            timeout=30,
-        )
+        if from_date and to_date and _settings.report_chunking != "off":
+            data = fetch_conversion_report_chunked(
+                base_url=base_url,
+                exp_id=exp_id,
+                aid=aid,
+                locale=locale,
+                from_date=from_date,
+                to_date=to_date,
+                bearer=bearer,
+                timeout=30,
+                unit=_settings.report_chunking,
+                cache_ttl=_settings.trends_cache_ttl,
+                deadline=deadline,
+                hedge_percentile=_settings.hedge_percentile,
+            )
+        else:
+            data = fetch_conversion_report_hedged(
+                base_url=base_url,
+                exp_id=exp_id,
+                aid=aid,
+                locale=locale,
+                from_date=from_date,
+                to_date=to_date,
+                bearer=bearer,
+                timeout=30,
+                deadline=deadline,
+                hedge_percentile=_settings.hedge_percentile,
+            )
     except Exception as exc:
-        return jsonify({"error": str(exc)}), 502
+        return _upstream_error(exc)
 
-    return jsonify({"ok": True, "data": data})
+    with stage("serialize"):
+        # encoding=columnar: rows as dictionary-encoded columns (see encode_rows_columnar)
+        if (body.get("encoding") or request.args.get("encoding")) == "columnar" and isinstance(data.get("rows"), list):
+            data = {**data, "rows": encode_rows_columnar(data["rows"])}
+        return jsonify({"ok": True, "data": data})
 
 
 @app.post("/api/csv")
 def api_csv():
-    body: Dict[str, Any] = request.get_json(silent=True) or {}
+    with stage("parse"):
+        body: Dict[str, Any] = request.get_json(silent=True) or {}
     data = body.get("data")
     if not isinstance(data, dict):
         return jsonify({"error": "Missing data"}), 400
+    data = decode_report(data)
+
+    with stage("aggregate"):
+        csv_map = build_all_csvs(data)
+        csv_map.update(build_action_cards_csvs(data))
+    with stage("serialize"):
+        return jsonify({"ok": True, "files": csv_map})
+
+
+@app.post("/api/pivot")
+def api_pivot():
+    """Group-by/filter query over report rows.
+
+    Body: groupBy (list of dimensions), filters ({dimension: value | [values]}),
+    optional limit, and either data (a report, like /api/csv) or the /api/report
+    fields (expId, brand/aid, from, to, bearer). Cubes for fetched reports are cached
+    for TRENDS_CACHE_TTL, so repeat queries on the same range skip fetch and build.
+    """
+    body: Dict[str, Any] = request.get_json(silent=True) or {}
+    group_by = body.get("groupBy") or []
+    filters = body.get("filters") or {}
+    if not isinstance(group_by, list) or not isinstance(filters, dict):
+        return jsonify({"error": "groupBy must be a list and filters an object"}), 400
+    if not all(isinstance(d, str) for d in group_by):
+        return jsonify({"error": "groupBy entries must be dimension names (strings)"}), 400
+    scalar = (str, int, float, bool, type(None))
+    for vals in filters.values():
+        if not all(isinstance(v, scalar) for v in (vals if isinstance(vals, list) else [vals])):
+            return jsonify({"error": "filter values must be strings, numbers, booleans or null"}), 400
+
+    data = body.get("data")
+    if isinstance(data, dict):
+        with stage("aggregate"):
+            cube = build_pivot_cube(decode_report(data))
+    else:
+        exp_id = body.get("expId") or _settings.exp_id
+        aid = resolve_aid(body.get("brand")) or body.get("aid") or _settings.aid
+        bearer = body.get("bearer") or _settings.bearer
+        from_date = body.get("from")
+        to_date = body.get("to")
+        base_url = body.get("baseUrl") or DEFAULT_BASE_URL
+        if not bearer:
+            return jsonify({"error": "Missing bearer token"}), 400
+        if not from_date or not to_date:
+            return jsonify({"error": "Missing from/to date"}), 400
+        cache_key = (base_url, exp_id, aid, token_key(bearer), from_date, to_date)
+        now_ts = time.time()
+        cached = _PIVOT_CACHE.get(cache_key)
+        if cached and (now_ts - cached[0]) < _settings.trends_cache_ttl:
+            cube = cached[1]
+        else:
+            try:
+                report = fetch_conversion_report_chunked(
+                    base_url=base_url,
+                    exp_id=exp_id,
+                    aid=aid,
+                    locale="en_US",
+                    from_date=from_date,
+                    to_date=to_date,
+                    bearer=bearer,
+                    timeout=30,
+                    unit=_settings.report_chunking if _settings.report_chunking != "off" else "months",
+                    cache_ttl=_settings.trends_cache_ttl,
+                    deadline=_request_deadline(body),
+                    hedge_percentile=_settings.hedge_percentile,
+                )
+            except Exception as exc:
+                return _upstream_error(exc)
+            with stage("aggregate"):
+                cube = build_pivot_cube(report)
+            _PIVOT_CACHE[cache_key] = (now_ts, cube)
+            if len(_PIVOT_CACHE) > _PIVOT_CACHE_MAX:
+                prune_cache(_PIVOT_CACHE, max_age=_settings.trends_cache_ttl, max_entries=_PIVOT_CACHE_MAX)
 
-    csv_map = build_all_csvs(data)
-    csv_map.update(build_action_cards_csvs(data))
-    return jsonify({"ok": True, "files": csv_map})
+    try:
+        with stage("aggregate"):
+            rows = query_pivot_cube(cube, group_by, filters)
+    except ValueError as exc:
+        return jsonify({"error": str(exc)}), 400
+    total = len(rows)
+    limit = body.get("limit")
+    if isinstance(limit, int) and limit >= 0:
+        rows = rows[:limit]
+    return jsonify({"ok": True, "groupBy": group_by, "filters": filters, "rows": rows, "total": total})
 
 
 def _daterange_days(start: dt.date, end: dt.date):
@@ -116,35 +421,122 @@ def _daterange_months(start: dt.date, end: dt.date):
         cur = next_month
 
 
-@app.post("/api/trends")
-def api_trends():
-    body: Dict[str, Any] = request.get_json(silent=True) or {}
-    exp_id = body.get("expId") or os.environ.get("PIANO_EXP_ID", "EXCTYT87DM0F")
+def _build_slices(cadence: str, start: dt.date, end: dt.date):
+    """Return the list of (from, to) windows for a cadence, or None if unknown."""
+    if cadence == "days":
+        return list(_daterange_days(start, end))
+    if cadence == "weeks":
+        return list(_daterange_weeks(start, end))
+    if cadence == "months":
+        return list(_daterange_months(start, end))
+    return None
+
+
+def _slice_aggregate(*, base_url: str, exp_id: str, aid: str, bearer: str, s: dt.date, e: dt.date, deadline: Optional[float] = None) -> tuple[dict, dict, bool]:
+    """Fetch (or read from cache) the aggregates for one slice.
+
+    The aggregate covers every action card and term in the slice, so the cache
+    entry serves any actionCardIds selection; callers filter when building
+    responses.
+
+    Returns (max_exposure_per_action, term_conversions_per_action, from_cache).
+    Raises on upstream failure (DeadlineExceeded once the request's budget is
+    spent) so callers can decide how to report it.
+    """
+    cache_key = (base_url, exp_id, aid, s.isoformat(), e.isoformat())
+    now_ts = dt.datetime.utcnow().timestamp()
+    cached = _SLICE_CACHE.get(cache_key)
+    if cached and (now_ts - cached[0]) < _settings.trends_cache_ttl:
+        agg = cached[1]
+        return agg.get("max_exposure_per_action", {}), agg.get("term_conversions_per_action", {}), True
+
+    data = fetch_conversion_report_hedged(
+        base_url=base_url,
+        exp_id=exp_id,
+        aid=aid,
+        locale="en_US",
+        from_date=s.isoformat(),
+        to_date=e.isoformat(),
+        bearer=bearer,
+        timeout=30,
+        deadline=deadline,
+        hedge_percentile=_settings.hedge_percentile,
+    )
+
+    with stage("aggregate"):
+        max_exposure_per_action, term_conversions_per_action = _aggregate_slice_rows(data.get("rows") or [])
+
+    _SLICE_CACHE[cache_key] = (now_ts, {
+        "max_exposure_per_action": max_exposure_per_action,
+        "term_conversions_per_action": term_conversions_per_action,
+    })
+    return max_exposure_per_action, term_conversions_per_action, False
+
+
+def _aggregate_slice_rows(rows: list) -> tuple[dict, dict]:
+    # Build max exposures per action for the slice to avoid double counting
+    # And sum conversions per (action, term) for the slice
+    max_exposure_per_action: Dict[str, float] = {}
+    term_conversions_per_action: Dict[tuple[str, str], int] = {}
+    for r in rows:
+        meta = r.get("conversionSetMetadata") or {}
+        ac_id = (meta.get("actionCard") or {}).get("id")
+        if not ac_id:
+            continue
+        exp = r.get("exposures") or 0
+        cur = max_exposure_per_action.get(ac_id) or 0
+        if exp > cur:
+            max_exposure_per_action[ac_id] = exp
+        # per term conversions (sum)
+        term = ((meta.get("term") or {}).get("name") or (meta.get("term") or {}).get("id") or "").strip()
+        if term:
+            key = (ac_id, term)
+            term_conversions_per_action[key] = (term_conversions_per_action.get(key) or 0) + int(r.get("conversions") or 0)
+    return max_exposure_per_action, term_conversions_per_action
+
+
+def _trends_params(body: Dict[str, Any]):
+    """Validate a trends request body.
+
+    Returns (params, None) on success or (None, (json, status)) on error.
+    """
+    exp_id = body.get("expId") or _settings.exp_id
     brand = body.get("brand")
-    aid = resolve_aid(brand) or body.get("aid") or os.environ.get("PIANO_AID", "N8sydUSDcX")
-    bearer = body.get("bearer") or os.environ.get("PIANO_BEARER")
+    aid = resolve_aid(brand) or body.get("aid") or _settings.aid
+    bearer = body.get("bearer") or _settings.bearer
     if not bearer:
-        return jsonify({"error": "Missing bearer token"}), 400
-    from_date = body.get("from")
-    to_date = body.get("to")
+        return None, (jsonify({"error": "Missing bearer token"}), 400)
     cadence = (body.get("cadence") or "days").lower()
-    action_ids = body.get("actionCardIds") or []
-    base_url = body.get("baseUrl") or DEFAULT_BASE_URL
-
     try:
-        start = dt.date.fromisoformat(from_date)
-        end = dt.date.fromisoformat(to_date)
+        start = dt.date.fromisoformat(body.get("from"))
+        end = dt.date.fromisoformat(body.get("to"))
     except Exception:
-        return jsonify({"error": "Invalid from/to date"}), 400
+        return None, (jsonify({"error": "Invalid from/to date"}), 400)
+    slices = _build_slices(cadence, start, end)
+    if slices is None:
+        return None, (jsonify({"error": "Invalid cadence"}), 400)
+    return {
+        "exp_id": exp_id,
+        "aid": aid,
+        "bearer": bearer,
+        "cadence": cadence,
+        "slices": slices,
+        "action_ids": body.get("actionCardIds") or [],
+        "base_url": body.get("baseUrl") or DEFAULT_BASE_URL,
+        "deadline": _request_deadline(body),
+        "budget": _request_budget(body),
+    }, None
 
-    if cadence == "days":
-        slices = list(_daterange_days(start, end))
-    elif cadence == "weeks":
-        slices = list(_daterange_weeks(start, end))
-    elif cadence == "months":
-        slices = list(_daterange_months(start, end))
-    else:
-        return jsonify({"error": "Invalid cadence"}), 400
+
+@app.post("/api/trends")
+def api_trends():
+    body: Dict[str, Any] = request.get_json(silent=True) or {}
+    params, err = _trends_params(body)
+    if err:
+        return err
+    cadence = params["cadence"]
+    slices = params["slices"]
+    action_ids = params["action_ids"]
 
     extended = bool(body.get("extended"))
     truncated = False
@@ -156,55 +548,26 @@ def api_trends():
     # Prepare series dicts
     by_action = {ac_id: [0] * len(slices) for ac_id in action_ids}
     terms_by_action: Dict[str, Dict[str, list[int]]] = {ac_id: {} for ac_id in action_ids}
+    missed: list[str] = []
 
     # Iterate slices and fetch
     for idx, (s, e) in enumerate(slices):
-        cache_key = (base_url, exp_id, aid, s.isoformat(), e.isoformat())
-        now_ts = dt.datetime.utcnow().timestamp()
-        cached = _SLICE_CACHE.get(cache_key)
-        if cached and (now_ts - cached[0]) < _CACHE_TTL_SECONDS:
-            agg = cached[1]
-            max_exposure_per_action = agg.get("max_exposure_per_action", {})  # type: ignore
-            term_conversions_per_action = agg.get("term_conversions_per_action", {})  # type: ignore
-        else:
-            try:
-                data = fetch_conversion_report(
-                    base_url=base_url,
-                    exp_id=exp_id,
-                    aid=aid,
-                    locale="en_US",
-                    from_date=s.isoformat(),
-                    to_date=e.isoformat(),
-                    bearer=bearer,
-                    timeout=30,
-                )
-            except Exception as exc:
-                return jsonify({"error": f"fetch failed for slice {s}..{e}: {exc}"}), 502
-
-            rows = data.get("rows") or []
-            # Build max exposures per action for the slice to avoid double counting
-            # And sum conversions per (action, term) for the slice
-            max_exposure_per_action: Dict[str, float] = {}
-            term_conversions_per_action: Dict[tuple[str, str], int] = {}
-            for r in rows:
-                meta = r.get("conversionSetMetadata") or {}
-                ac_id = (meta.get("actionCard") or {}).get("id")
-                if not ac_id:
-                    continue
-                exp = r.get("exposures") or 0
-                cur = max_exposure_per_action.get(ac_id) or 0
-                if exp > cur:
-                    max_exposure_per_action[ac_id] = exp
-                # per term conversions (sum)
-                term = ((meta.get("term") or {}).get("name") or (meta.get("term") or {}).get("id") or "").strip()
-                if term and ac_id in action_ids:
-                    key = (ac_id, term)
-                    term_conversions_per_action[key] = (term_conversions_per_action.get(key) or 0) + int(r.get("conversions") or 0)
-
-            _SLICE_CACHE[cache_key] = (now_ts, {
-                "max_exposure_per_action": max_exposure_per_action,
-                "term_conversions_per_action": term_conversions_per_action,
-            })
+        try:
+            max_exposure_per_action, term_conversions_per_action, _ = _slice_aggregate(
+                base_url=params["base_url"],
+                exp_id=params["exp_id"],
+                aid=params["aid"],
+                bearer=params["bearer"],
+                s=s,
+                e=e,
+                deadline=params["deadline"],
+            )
+        except DeadlineExceeded:
+            # Leave the slice at zero and report it instead of failing the request
+            missed.append(s.isoformat())
+            continue
+        except Exception as exc:
+            return _upstream_error(exc, f"fetch failed for slice {s}..{e}: ")
 
         for ac_id in action_ids:
             by_action[ac_id][idx] = int(max_exposure_per_action.get(ac_id) or 0)
@@ -218,162 +581,471 @@ def api_trends():
                 terms_by_action[ac_id][term] = series
             series[idx] = int(conv or 0)
 
-    return jsonify({
-        "ok": True,
-        "cadence": cadence,
-        "labels": labels,
-        "actions": by_action,
-        "terms": terms_by_action,
-        "truncated": truncated,
-    })
+    with stage("serialize"):
+        return jsonify({
+            "ok": True,
+            "cadence": cadence,
+            "labels": labels,
+            "actions": by_action,
+            "terms": terms_by_action,
+            "truncated": truncated,
+            "missed": missed,
+        })
+
+
+@app.post("/api/trends/stream")
+def api_trends_stream():
+    """Stream trends as NDJSON: one record per slice as soon as it is ready.
+
+    Records, one JSON object per line:
+    - {"type": "meta", "cadence", "labels", "slices"} first
+    - {"type": "slice", "index", "label", "from", "to", "actions", "terms", "cached"} per slice
+    - {"type": "error", "index", "label", "from", "to", "error", "deadline"} for a slice
+      that failed (deadline=true if it missed the request deadline)
+    - {"type": "summary", "ok", "slices", "failed", "missed", "aborted", "cached"} last;
+      aborted="token_invalid" when Piano rejected the bearer and later slices were skipped
+
+    Unlike /api/trends the range is never truncated, a failing slice does not
+    abort the remaining ones, and the deadline (REQUEST_DEADLINE_SECONDS or
+    deadlineMs) applies to each slice rather than to the whole stream.
+    """
+    body: Dict[str, Any] = request.get_json(silent=True) or {}
+    params, err = _trends_params(body)
+    if err:
+        return err
+    slices = params["slices"]
+    action_ids = params["action_ids"]
+
+    def line(record: Dict[str, Any]) -> str:
+        with stage("serialize"):
+            return json.dumps(record, separators=(",", ":")) + "\n"
+
+    def generate():
+        yield line({
+            "type": "meta",
+            "cadence": params["cadence"],
+            "labels": [s.isoformat() for s, _ in slices],
+            "slices": len(slices),
+        })
+        failed: list[int] = []
+        missed: list[int] = []
+        aborted = None
+        cached_count = 0
+        for idx, (s, e) in enumerate(slices):
+            try:
+                max_exposure_per_action, term_conversions_per_action, from_cache = _slice_aggregate(
+                    base_url=params["base_url"],
+                    exp_id=params["exp_id"],
+                    aid=params["aid"],
+                    bearer=params["bearer"],
+                    s=s,
+                    e=e,
+                    # Slices run one after another, so each gets the full budget:
+                    # it still bounds a stuck call without cutting off long ranges
+                    deadline=time.monotonic() + params["budget"],
+                )
+            except Exception as exc:
+                failed.append(idx)
+                missed_deadline = isinstance(exc, DeadlineExceeded)
+                if missed_deadline:
+                    missed.append(idx)
+                yield line({
+                    "type": "error",
+                    "index": idx,
+                    "label": s.isoformat(),
+                    "from": s.isoformat(),
+                    "to": e.isoformat(),
+                    "error": f"fetch failed for slice {s}..{e}: {exc}",
+                    "deadline": missed_deadline,
+                    "tokenInvalid": isinstance(exc, UpstreamAuthError),
+                    "circuitOpen": isinstance(exc, CircuitOpenError),
+                })
+                if isinstance(exc, UpstreamAuthError):
+                    # Every remaining slice would fail the same way
+                    aborted = "token_invalid"
+                    break
+                continue
+            if from_cache:
+                cached_count += 1
+            terms: Dict[str, Dict[str, int]] = {ac_id: {} for ac_id in action_ids}
+            for (ac_id, term), conv in term_conversions_per_action.items():
+                if ac_id in terms:
+                    terms[ac_id][term] = int(conv or 0)
+            yield line({
+                "type": "slice",
+                "index": idx,
+                "label": s.isoformat(),
+                "from": s.isoformat(),
+                "to": e.isoformat(),
+                "actions": {ac_id: int(max_exposure_per_action.get(ac_id) or 0) for ac_id in action_ids},
+                "terms": terms,
+                "cached": from_cache,
+            })
+        yield line({
+            "type": "summary",
+            "ok": not failed,
+            "slices": len(slices),
+            "failed": failed,
+            "missed": missed,
+            "aborted": aborted,
+            "cached": cached_count,
+        })
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype="application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+# Known API statuses -> experience groups
+_EXPERIENCE_STATUS_GROUPS = {
+    "LIVE": "active",
+    "SCHEDULED": "scheduled",
+    "OFFLINE": "inactive",
+    # Back-compat if API ever returns these
+    "ACTIVE": "active",
+    "INACTIVE": "inactive",
+}
+
+
+def _extract_items(obj: Any):
+    if isinstance(obj, list):
+        return obj
+    for key in ("experiences", "items", "data", "list", "records"):
+        val = obj.get(key)
+        if isinstance(val, list):
+            return val
+        if isinstance(val, dict) and isinstance(val.get("items"), list):
+            return val["items"]
+    return []
+
+
+def _parse_dt(val: Any):
+    if not val:
+        return None
+    try:
+        if isinstance(val, (int, float)):
+            # epoch seconds or ms
+            ts = val/1000.0 if val > 1e12 else val
+            return dt.datetime.utcfromtimestamp(ts)
+        # ISO
+        return dt.datetime.fromisoformat(str(val).replace("Z", "+00:00")).astimezone(dt.timezone.utc).replace(tzinfo=None)
+    except Exception:
+        return None
+
+
+def _experience_group(it: Dict[str, Any], now: Optional[dt.datetime] = None) -> str:
+    """active/scheduled/inactive for one experience: by status, else by schedule window."""
+    now = now or dt.datetime.utcnow()
+    raw_status = (it.get("status") or it.get("state") or "").strip()
+    mapped = _EXPERIENCE_STATUS_GROUPS.get(raw_status.upper())
+    if mapped in ("active", "scheduled", "inactive"):
+        return mapped
+    start = _parse_dt(it.get("start") or it.get("startDate") or it.get("start_time"))
+    end = _parse_dt(it.get("end") or it.get("endDate") or it.get("end_time"))
+    # If schedule is provided as JSON string with intervals, derive start/end
+    sched_raw = it.get("schedule")
+    if not start and sched_raw:
+        try:
+            sched = json.loads(sched_raw) if isinstance(sched_raw, str) else sched_raw
+            intervals = sched.get("intervals") or []
+            if intervals:
+                s_ms = intervals[0].get("startDate")
+                e_ms = intervals[0].get("endDate")
+                start = _parse_dt(s_ms)
+                end = _parse_dt(e_ms) if e_ms else end
+        except Exception:
+            pass
+    if start and end:
+        if start <= now <= end:
+            return "active"
+        if now < start:
+            return "scheduled"
+        return "inactive"
+    if start and now < start:
+        return "scheduled"
+    return "inactive"
+
+
+def _group_experiences(items: list) -> Dict[str, list]:
+    """Split experiences into active/scheduled/inactive by status, else by schedule window."""
+    now = dt.datetime.utcnow()
+    groups: Dict[str, list] = {"active": [], "scheduled": [], "inactive": []}
+    for it in items:
+        groups[_experience_group(it, now)].append(it)
+    return groups
+
+
+def _fetch_experience_list(*, base_url: str, aid: str, api_token: Optional[str], limit: Any = None, offset: Any = None, timeout: float = 30) -> Any:
+    """GET publisher/experience/metadata/list for one aid; raises on HTTP errors."""
+    url = f"{base_url.rstrip('/')}/publisher/experience/metadata/list"
+    headers = {"Accept": "application/json"}
+    params = {"aid": aid}
+    if api_token:
+        params["api_token"] = api_token
+    # Support optional pagination if provided
+    if limit:
+        params["limit"] = limit
+    if offset is not None:
+        params["offset"] = offset
+    # Prefer GET with query params as per provided example
+    with stage("fetch"):
+        resp = guarded_get(url, params=params, headers=headers, timeout=timeout, token=api_token)
+    with stage("parse"):
+        return resp.json()
 
 
 @app.post("/api/experiences")
 def api_experiences():
     body: Dict[str, Any] = request.get_json(silent=True) or {}
+    settings = _settings
     brand = body.get("brand")
     # Resolve AID: prefer explicit 'aid', else try brand as AID, else brand name mapping, else env default
     cand_aid = body.get("aid")
     if not cand_aid and brand:
-        # If brand looks like an AID or we have a per-AID token env for it, treat as AID
-        env_key = f"PIANO_API_TOKEN_{brand}"
+        # If brand looks like an AID or we have a per-AID token for it, treat as AID
         looks_like_aid = isinstance(brand, str) and len(brand) >= 8 and brand.isalnum()
-        if env_key in os.environ or looks_like_aid:
+        if brand in settings.api_tokens or looks_like_aid:
             cand_aid = brand
-    aid = cand_aid or (resolve_aid(brand) if brand else None) or os.environ.get("PIANO_AID")
+    aid = cand_aid or (resolve_aid(brand) if brand else None) or settings.aid
     if not aid:
         return jsonify({"error": "Missing aid"}), 400
-    # Load .env (if present) for local dev
-    try:
-        from dotenv import load_dotenv  # type: ignore
-        load_dotenv()
-    except Exception:
-        pass
     # Resolve API token precedence: body.apiToken > PIANO_API_TOKEN_<AID> > PIANO_API_TOKEN
-    api_token = (
-        body.get("apiToken")
-        or os.environ.get(f"PIANO_API_TOKEN_{aid}")
-        or os.environ.get("PIANO_API_TOKEN")
-    )
-    bearer = body.get("bearer") or os.environ.get("PIANO_BEARER")
+    api_token = body.get("apiToken") or settings.token_for(aid)
+    bearer = body.get("bearer") or settings.bearer
     if not api_token and not bearer:
         return jsonify({"error": "Provide apiToken (recommended) or bearer"}), 400
 
-    base_url = body.get("baseUrl") or "https://api.piano.io/api/v3"
-    url = f"{base_url.rstrip('/')}/publisher/experience/metadata/list"
+    base_url = body.get("baseUrl") or settings.experiences_base_url
     try:
-        import requests
-        headers = {"Accept": "application/json"}
-        params = {"aid": aid}
-        if api_token:
-            params["api_token"] = api_token
-        # Support optional pagination if provided in body
-        if body.get("limit"):
-            params["limit"] = body.get("limit")
-        if body.get("offset") is not None:
-            params["offset"] = body.get("offset")
-        # Prefer GET with query params as per provided example
-        resp = requests.get(url, params=params, headers=headers, timeout=30)
-        resp.raise_for_status()
-        data = resp.json()
+        data = _fetch_experience_list(
+            base_url=base_url,
+            aid=aid,
+            api_token=api_token,
+            limit=body.get("limit"),
+            offset=body.get("offset"),
+        )
     except Exception as exc:
-        return jsonify({"error": f"Experiences fetch failed: {exc}"}), 502
-
-    def extract_items(obj: Dict[str, Any]):
-        for key in ("experiences", "items", "data", "list", "records"):
-            val = obj.get(key)
-            if isinstance(val, list):
-                return val
-            if isinstance(val, dict) and isinstance(val.get("items"), list):
-                return val["items"]
-        if isinstance(obj, list):
-            return obj
-        return []
+        return _upstream_error(exc, "Experiences fetch failed: ")
 
-    items = extract_items(data)
-    now = dt.datetime.utcnow()
-    groups = {"active": [], "scheduled": [], "inactive": []}
+    items = _extract_items(data)
+    groups = _group_experiences(items)
+    # A single page (limit/offset) only upserts; a full list also drops removed experiences
+    _EXPERIENCE_INDEX.update(aid, items, group_of=_experience_group, complete=not body.get("limit") and body.get("offset") is None)
+    return jsonify({"ok": True, "aid": aid, "groups": groups, "count": len(items)})
 
-    def parse_dt(val: Any):
-        if not val:
-            return None
-        try:
-            if isinstance(val, (int, float)):
-                # epoch seconds or ms
-                ts = val/1000.0 if val > 1e12 else val
-                return dt.datetime.utcfromtimestamp(ts)
-            # ISO
-            return dt.datetime.fromisoformat(str(val).replace("Z", "+00:00")).astimezone(dt.timezone.utc).replace(tzinfo=None)
-        except Exception:
-            return None
 
-    for it in items:
-        raw_status = (it.get("status") or it.get("state") or "").strip()
-        norm_status = raw_status.upper()
-        start = parse_dt(it.get("start") or it.get("startDate") or it.get("start_time"))
-        end = parse_dt(it.get("end") or it.get("endDate") or it.get("end_time"))
-        # If schedule is provided as JSON string with intervals, derive start/end
-        sched_raw = it.get("schedule")
-        if not start and sched_raw:
-            try:
-                import json as _json
-                sched = _json.loads(sched_raw) if isinstance(sched_raw, str) else sched_raw
-                intervals = sched.get("intervals") or []
-                if intervals:
-                    s_ms = intervals[0].get("startDate")
-                    e_ms = intervals[0].get("endDate")
-                    start = parse_dt(s_ms)
-                    end = parse_dt(e_ms) if e_ms else end
-            except Exception:
-                pass
-        # Map known API statuses to our groups
-        status_map = {
-            "LIVE": "active",
-            "SCHEDULED": "scheduled",
-            "OFFLINE": "inactive",
-            # Back-compat if API ever returns these
-            "ACTIVE": "active",
-            "INACTIVE": "inactive",
+def _upstream_timeout(body: Dict[str, Any]) -> Optional[float]:
+    """body.timeout in seconds (default 30) clamped to 1..120; None if it is not a number."""
+    raw = body.get("timeout")
+    if raw is None or raw == "":
+        return 30.0
+    try:
+        return min(120.0, max(1.0, float(raw)))
+    except (TypeError, ValueError):
+        return None
+
+
+def _fetch_brands_experiences(targets: list, *, base_url: str, timeout: float, settings) -> list:
+    """Fetch and index the experience list of each (brand, aid) concurrently; one result dict per target."""
+
+    def one(target: tuple[str, str]) -> Dict[str, Any]:
+        name, aid = target
+        api_token = settings.token_for(aid)
+        started = time.perf_counter()
+        if not api_token:
+            return {"brand": name, "aid": aid, "ok": False, "error": f"No API token configured (PIANO_API_TOKEN_{aid})", "ms": 0}
+        try:
+            data = _fetch_experience_list(base_url=base_url, aid=aid, api_token=api_token, timeout=timeout)
+        except Exception as exc:
+            return {
+                "brand": name, "aid": aid, "ok": False, "error": f"Experiences fetch failed: {exc}",
+                "tokenInvalid": isinstance(exc, UpstreamAuthError), "circuitOpen": isinstance(exc, CircuitOpenError),
+                "ms": round((time.perf_counter() - started) * 1000),
+            }
+        items = _extract_items(data)
+        _EXPERIENCE_INDEX.update(aid, items, group_of=_experience_group)
+        return {
+            "brand": name,
+            "aid": aid,
+            "ok": True,
+            "groups": _group_experiences(items),
+            "count": len(items),
+            "ms": round((time.perf_counter() - started) * 1000),
         }
-        mapped = status_map.get(norm_status)
-        if mapped in groups:
-            groups[mapped].append(it)
-            continue
-        if start and end:
-            if start <= now <= end:
-                groups["active"].append(it)
-            elif now < start:
-                groups["scheduled"].append(it)
-            else:
-                groups["inactive"].append(it)
-        elif start and now < start:
-            groups["scheduled"].append(it)
-        else:
-            groups["inactive"].append(it)
 
-    return jsonify({"ok": True, "aid": aid, "groups": groups, "count": len(items)})
+    if not targets:
+        return []
+    with ThreadPoolExecutor(max_workers=len(targets), thread_name_prefix="piano-brands") as pool:
+        return list(pool.map(propagate(one), targets))
+
+
+@app.post("/api/experiences/all")
+def api_experiences_all():
+    """Fetch experience lists for every configured brand (or body.brands) concurrently.
+
+    Each brand uses its PIANO_API_TOKEN_<AID> (or PIANO_API_TOKEN) and reports its own
+    timing and error, so one slow or failing brand does not hold back the others.
+    """
+    body: Dict[str, Any] = request.get_json(silent=True) or {}
+    settings = _settings
+    wanted = body.get("brands")
+    if wanted is not None and (not isinstance(wanted, list) or not all(isinstance(b, str) for b in wanted)):
+        return jsonify({"error": "brands must be a list of brand names or aids"}), 400
+    timeout = _upstream_timeout(body)
+    if timeout is None:
+        return jsonify({"error": "timeout must be a number of seconds"}), 400
+    if wanted:
+        targets = []
+        for brand in wanted:
+            aid = resolve_aid(brand) or (brand if brand in BRAND_TO_AID.values() else None)
+            if not aid:
+                return jsonify({"error": f"Unknown brand: {brand}"}), 400
+            name = next((n for n, a in BRAND_TO_AID.items() if a == aid), brand)
+            targets.append((name, aid))
+    else:
+        targets = list(BRAND_TO_AID.items())
+    base_url = body.get("baseUrl") or settings.experiences_base_url
+
+    started = time.perf_counter()
+    results = _fetch_brands_experiences(targets, base_url=base_url, timeout=timeout, settings=settings)
+    return jsonify({
+        "ok": any(r["ok"] for r in results),
+        "results": {r["aid"]: r for r in results},
+        "failed": [r["aid"] for r in results if not r["ok"]],
+        "ms": round((time.perf_counter() - started) * 1000),
+    })
+
+
+@app.post("/api/experiences/search")
+def api_experiences_search():
+    """Ranked search over indexed experience lists (title, id, status, type).
+
+    Body: q, optional brands (names or aids; default all brands), statuses
+    (active/scheduled/inactive), offset, limit (max 200). Brands whose list is not
+    indexed yet, or older than EXPERIENCE_INDEX_TTL, are fetched first unless
+    refresh is false. Lists loaded through /api/experiences(/all) update the index too.
+    """
+    body: Dict[str, Any] = request.get_json(silent=True) or {}
+    settings = _settings
+    brands = body.get("brands") or list(BRAND_TO_AID)
+    if not isinstance(brands, list) or not all(isinstance(b, str) for b in brands):
+        return jsonify({"error": "brands must be a list of brand names or aids"}), 400
+    targets = []
+    for brand in brands:
+        known = brand in BRAND_TO_AID.values() or brand in settings.api_tokens or _EXPERIENCE_INDEX.has(brand)
+        aid = resolve_aid(brand) or (brand if known else None)
+        if not aid:
+            return jsonify({"error": f"Unknown brand: {brand}"}), 400
+        targets.append((next((n for n, a in BRAND_TO_AID.items() if a == aid), brand), aid))
+    statuses = body.get("statuses") or None
+    if statuses is not None and (not isinstance(statuses, list) or set(statuses) - {"active", "scheduled", "inactive"}):
+        return jsonify({"error": "statuses must be a list of active/scheduled/inactive"}), 400
+    try:
+        offset = max(0, int(body.get("offset") or 0))
+        limit = min(200, max(1, int(body.get("limit") or 50)))
+    except (TypeError, ValueError):
+        return jsonify({"error": "offset and limit must be integers"}), 400
+    timeout = _upstream_timeout(body)
+    if timeout is None:
+        return jsonify({"error": "timeout must be a number of seconds"}), 400
+
+    failed = []
+    refreshed = []
+    if body.get("refresh", True):
+        ages = {aid: _EXPERIENCE_INDEX.age(aid) for _, aid in targets}
+        stale = [(name, aid) for name, aid in targets if ages[aid] is None or ages[aid] > settings.experience_index_ttl]
+        results = _fetch_brands_experiences(
+            stale,
+            base_url=body.get("baseUrl") or settings.experiences_base_url,
+            timeout=timeout,
+            settings=settings,
+        )
+        refreshed = [r["aid"] for r in results if r["ok"]]
+        failed = [{"aid": r["aid"], "brand": r["brand"], "error": r["error"]} for r in results if not r["ok"]]
+
+    total, hits = _EXPERIENCE_INDEX.search(
+        str(body.get("q") or ""),
+        aids=[aid for _, aid in targets],
+        groups=statuses,
+        offset=offset,
+        limit=limit,
+    )
+    return jsonify({
+        "ok": True,
+        "total": total,
+        "offset": offset,
+        "limit": limit,
+        "hits": hits,
+        "refreshed": refreshed,
+        "failed": failed,
+        "indexed": _EXPERIENCE_INDEX.stats(),
+    })
+
+
+@app.post("/api/upstream/status")
+def api_upstream_status():
+    """Circuit state per upstream host and whether body.bearer is currently marked invalid."""
+    body: Dict[str, Any] = request.get_json(silent=True) or {}
+    return jsonify({"ok": True, **breaker_status(body.get("bearer"))})
+
+
+@app.post("/api/admin/reload-config")
+def api_admin_reload_config():
+    """Re-read env/.env without a restart. Requires ADMIN_TOKEN via X-Admin-Token."""
+    denied = _admin_denied()
+    if denied:
+        return denied
+    try:
+        settings = reload_settings()
+    except ValueError as exc:
+        return jsonify({"error": str(exc)}), 400
+    return jsonify({"ok": True, "aids": sorted(settings.api_tokens)})
+
+
+@app.get("/api/admin/profiles")
+def api_admin_profiles():
+    """Stored request profiles, newest first (needs PROFILING_ENABLED and the admin token)."""
+    denied = _admin_denied()
+    if denied or not _settings.profiling:
+        return denied or (jsonify({"error": "Not found"}), 404)
+    return jsonify({"ok": True, "profiles": list_sessions(Path(_settings.profile_dir))})
+
+
+@app.get("/api/admin/profiles/<name>")
+def api_admin_profile_artifact(name: str):
+    """Download one artifact: <id>.json summary, .prof (pstats), .collapsed (flamegraph), .tracemalloc."""
+    denied = _admin_denied()
+    if denied or not _settings.profiling:
+        return denied or (jsonify({"error": "Not found"}), 404)
+    if not _PROFILE_ARTIFACT_RE.match(name):
+        return jsonify({"error": "Not found"}), 404
+    return send_from_directory(_settings.profile_dir, name, as_attachment=not name.endswith(".json"), max_age=0)
 
 
 @app.get("/download/extension.zip")
 def download_extension_zip():
-    """Package the browser extension directory into a zip and return it."""
-    root = Path(__file__).resolve().parent
-    ext_dir = root / "extension"
-    if not ext_dir.exists():
+    """Return the prebuilt browser extension zip (ETag = content hash)."""
+    built = _extension_zip()
+    if built is None:
         return jsonify({"error": "Extension directory not found"}), 404
-    buf = io.BytesIO()
-    with zipfile.ZipFile(buf, mode="w", compression=zipfile.ZIP_DEFLATED) as zf:
-        for path in ext_dir.rglob("*"):
-            if path.is_file():
-                zf.write(path, arcname=str(path.relative_to(ext_dir)))
-    buf.seek(0)
+    data, etag = built
     return send_file(
-        buf,
+        io.BytesIO(data),
         mimetype="application/zip",
         as_attachment=True,
         download_name="piano_composer_extension.zip",
+        etag=etag,
+        conditional=True,
+        max_age=0,
     )
 
 
+# Build once at startup so the first request doesn't pay for it
+_extension_zip()
+_index_html()
+
+
 if __name__ == "__main__":
-    app.run(host="0.0.0.0", port=int(os.environ.get("PORT", 5000)), debug=True)
+    app.run(host="0.0.0.0", port=int(os.environ.get("PORT", 5000)), debug=True, threaded=True)
@@ -0,0 +1,155 @@
+from __future__ import annotations
+
+import os
+import tempfile
+import threading
+from dataclasses import dataclass, field
+from typing import Dict, Mapping, Optional
+
+DEFAULT_EXPERIENCES_BASE_URL = "https://api.piano.io/api/v3"
+_TOKEN_PREFIX = "PIANO_API_TOKEN_"
+_CHUNKING_MODES = ("months", "days", "off")
+
+
+@dataclass(frozen=True)
+class Settings:
+    """Server configuration, read once from the environment (and .env if present)."""
+    exp_id: str = "EXCTYT87DM0F"
+    aid: str = "N8sydUSDcX"
+    bearer: Optional[str] = None
+    # Fallback token for /publisher endpoints when no per-AID token exists
+    api_token: Optional[str] = None
+    # aid -> PIANO_API_TOKEN_<AID>
+    api_tokens: Dict[str, str] = field(default_factory=dict)
+    experiences_base_url: str = DEFAULT_EXPERIENCES_BASE_URL
+    trends_cache_ttl: int = 300
+    # Seconds before /api/experiences/search refetches a brand's experience list
+    experience_index_ttl: int = 600
+    report_chunking: str = "months"
+    upstream_concurrency: int = 16
+    # Overall budget for one API request, split across its upstream calls
+    request_deadline: float = 60.0
+    # Hedge upstream calls slower than this latency percentile (0 disables)
+    hedge_percentile: float = 95.0
+    # Circuit breaker: consecutive 5xx/timeouts to open a host, seconds it stays open,
+    # and seconds a rejected (401/403) token is failed fast
+    breaker_failures: int = 5
+    breaker_cooldown: float = 30.0
+    auth_cooldown: float = 300.0
+    # Enables /api/admin/* endpoints when set
+    admin_token: Optional[str] = None
+    # Lets admins profile single requests (X-Profile header); needs admin_token too
+    profiling: bool = False
+    profile_dir: str = os.path.join(tempfile.gettempdir(), "piano-profiles")
+
+    def token_for(self, aid: Optional[str]) -> Optional[str]:
+        """Per-AID API token, falling back to PIANO_API_TOKEN."""
+        return (self.api_tokens.get(aid) if aid else None) or self.api_token
+
+
+def _read_environ() -> Dict[str, str]:
+    """Process env layered over .env; .env never overrides real env vars."""
+    values: Dict[str, str] = {}
+    try:
+        from dotenv import dotenv_values  # type: ignore
+        values.update({k: v for k, v in dotenv_values().items() if v is not None})
+    except Exception:
+        pass
+    values.update(os.environ)
+    return values
+
+
+def _int(env: Mapping[str, str], key: str, default: int) -> int:
+    raw = env.get(key)
+    if raw is None or raw == "":
+        return default
+    try:
+        return int(raw)
+    except ValueError as exc:
+        raise ValueError(f"{key} must be an integer, got {raw!r}") from exc
+
+
+def _float(env: Mapping[str, str], key: str, default: float) -> float:
+    raw = env.get(key)
+    if raw is None or raw == "":
+        return default
+    try:
+        return float(raw)
+    except ValueError as exc:
+        raise ValueError(f"{key} must be a number, got {raw!r}") from exc
+
+
+def _bool(env: Mapping[str, str], key: str, default: bool) -> bool:
+    raw = (env.get(key) or "").strip().lower()
+    if raw == "":
+        return default
+    if raw in ("1", "true", "yes", "on"):
+        return True
+    if raw in ("0", "false", "no", "off"):
+        return False
+    raise ValueError(f"{key} must be a boolean, got {raw!r}")
+
+
+def load_settings(env: Optional[Mapping[str, str]] = None) -> Settings:
+    """Build and validate Settings from env (defaults to os.environ + .env)."""
+    env = _read_environ() if env is None else env
+    chunking = (env.get("REPORT_CHUNKING") or "months").lower()
+    if chunking not in _CHUNKING_MODES:
+        raise ValueError(f"REPORT_CHUNKING must be one of {_CHUNKING_MODES}, got {chunking!r}")
+    tokens = {
+        key[len(_TOKEN_PREFIX):]: val.strip()
+        for key, val in env.items()
+        if key.startswith(_TOKEN_PREFIX) and val and val.strip()
+    }
+    return Settings(
+        exp_id=env.get("PIANO_EXP_ID") or Settings.exp_id,
+        aid=env.get("PIANO_AID") or Settings.aid,
+        bearer=env.get("PIANO_BEARER") or None,
+        api_token=env.get("PIANO_API_TOKEN") or None,
+        api_tokens=tokens,
+        experiences_base_url=env.get("PIANO_API_BASE_URL") or DEFAULT_EXPERIENCES_BASE_URL,
+        trends_cache_ttl=_int(env, "TRENDS_CACHE_TTL", 300),
+        experience_index_ttl=max(0, _int(env, "EXPERIENCE_INDEX_TTL", 600)),
+        report_chunking=chunking,
+        upstream_concurrency=max(1, _int(env, "PIANO_UPSTREAM_CONCURRENCY", 16)),
+        request_deadline=max(1.0, _float(env, "REQUEST_DEADLINE_SECONDS", 60.0)),
+        hedge_percentile=min(99.9, max(0.0, _float(env, "HEDGE_PERCENTILE", 95.0))),
+        breaker_failures=max(1, _int(env, "BREAKER_FAILURES", 5)),
+        breaker_cooldown=max(1.0, _float(env, "BREAKER_COOLDOWN_SECONDS", 30.0)),
+        auth_cooldown=max(0.0, _float(env, "AUTH_COOLDOWN_SECONDS", 300.0)),
+        admin_token=env.get("ADMIN_TOKEN") or None,
+        profiling=_bool(env, "PROFILING_ENABLED", False),
+        profile_dir=env.get("PROFILE_DIR") or Settings.profile_dir,
+    )
+
+
+_LOCK = threading.Lock()
+_SETTINGS: Optional[Settings] = None
+_RELOAD_HOOKS = []
+
+
+def get_settings() -> Settings:
+    """Current settings; loaded on first use."""
+    global _SETTINGS
+    if _SETTINGS is None:
+        with _LOCK:
+            if _SETTINGS is None:
+                _SETTINGS = load_settings()
+    return _SETTINGS
+
+
+def on_reload(fn):
+    """Register fn(settings) to run after every reload (usable as a decorator)."""
+    _RELOAD_HOOKS.append(fn)
+    return fn
+
+
+def reload_settings() -> Settings:
+    """Re-read env/.env, swap settings atomically and run reload hooks."""
+    global _SETTINGS
+    fresh = load_settings()
+    with _LOCK:
+        _SETTINGS = fresh
+    for fn in list(_RELOAD_HOOKS):
+        fn(fresh)
+    return fresh
@@ -0,0 +1,216 @@
+from __future__ import annotations
+
+import bisect
+import re
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+# Field -> weight when a query token matches a token of that field
+FIELD_WEIGHTS = {"experience_id": 4.0, "title": 3.0, "type": 1.0, "status": 1.0}
+# Exact token matches score this much more than prefix matches
+_EXACT_BONUS = 2.0
+_STATUS_ORDER = {"active": 0, "scheduled": 1, "inactive": 2}
+_TOKEN_RE = re.compile(r"[0-9a-z]+")
+
+DocKey = Tuple[str, str]  # (aid, experience id)
+
+
+def tokenize(text: Any) -> List[str]:
+    """Lowercase alphanumeric runs; "Paywall - 2024 Promo" -> ["paywall", "2024", "promo"]."""
+    return _TOKEN_RE.findall(str(text or "").lower())
+
+
+def experience_fields(item: Dict[str, Any]) -> Dict[str, str]:
+    """The searchable fields of one experience item, using the same fallbacks as the UI."""
+    eid = item.get("id") or item.get("experienceId") or item.get("experience_id") or ""
+    return {
+        "experience_id": str(eid),
+        "title": str(item.get("name") or item.get("title") or item.get("experienceName") or eid or ""),
+        "status": str(item.get("status") or item.get("state") or ""),
+        "type": str(item.get("type") or item.get("experienceType") or ""),
+    }
+
+
+class ExperienceIndex:
+    """Token/prefix index over experience lists of many aids.
+
+    Each aid's list is indexed on update(); only experiences that were added,
+    changed or removed since the previous update of that aid touch the postings.
+    A query matches when every query token is a prefix of some indexed token.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.RLock()
+        # token -> {doc key: best field weight among fields containing the token}
+        self._postings: Dict[str, Dict[DocKey, float]] = {}
+        # sorted distinct tokens, for prefix ranges via bisect
+        self._tokens: List[str] = []
+        # doc key -> {"item", "fields", "group", "tokens": {token: weight}, "sig"}
+        self._docs: Dict[DocKey, Dict[str, Any]] = {}
+        self._by_aid: Dict[str, set] = {}
+        self._refreshed: Dict[str, float] = {}
+
+    # ----- maintenance -----
+
+    def _add_postings(self, key: DocKey, tokens: Dict[str, float]) -> None:
+        for tok, weight in tokens.items():
+            posting = self._postings.get(tok)
+            if posting is None:
+                posting = self._postings[tok] = {}
+                bisect.insort(self._tokens, tok)
+            posting[key] = weight
+
+    def _remove_doc(self, key: DocKey) -> None:
+        doc = self._docs.pop(key, None)
+        if doc is None:
+            return
+        self._by_aid.get(key[0], set()).discard(key)
+        for tok in doc["tokens"]:
+            posting = self._postings.get(tok)
+            if posting is None:
+                continue
+            posting.pop(key, None)
+            if not posting:
+                del self._postings[tok]
+                i = bisect.bisect_left(self._tokens, tok)
+                if i < len(self._tokens) and self._tokens[i] == tok:
+                    del self._tokens[i]
+
+    def update(self, aid: str, items: Iterable[Dict[str, Any]], *, group_of, complete: bool = True) -> Dict[str, int]:
+        """Reindex aid from a freshly fetched list.
+
+        group_of(item) gives the item's status group (active/scheduled/inactive).
+        With complete=False (a single page of the list) experiences missing from
+        items are kept and the aid's freshness (age()) is left alone, since the
+        rest of the list was not seen; otherwise missing ones are dropped.
+        Returns added/changed/removed counts.
+        """
+        counts = {"added": 0, "changed": 0, "removed": 0}
+        with self._lock:
+            keys = self._by_aid.setdefault(aid, set())
+            seen = set()
+            for item in items:
+                if not isinstance(item, dict):
+                    continue
+                fields = experience_fields(item)
+                if not fields["experience_id"]:
+                    continue
+                key = (aid, fields["experience_id"])
+                seen.add(key)
+                group = group_of(item)
+                sig = (tuple(sorted(fields.items())), group, repr(sorted(item.items(), key=lambda kv: kv[0])))
+                old = self._docs.get(key)
+                if old is not None and old["sig"] == sig:
+                    continue
+                if old is not None:
+                    self._remove_doc(key)
+                    counts["changed"] += 1
+                else:
+                    counts["added"] += 1
+                tokens: Dict[str, float] = {}
+                for field, text in fields.items():
+                    for tok in tokenize(text):
+                        tokens[tok] = max(tokens.get(tok, 0.0), FIELD_WEIGHTS[field])
+                self._docs[key] = {"item": item, "fields": fields, "group": group, "tokens": tokens, "sig": sig}
+                keys.add(key)
+                self._add_postings(key, tokens)
+            if complete:
+                for key in list(keys - seen):
+                    self._remove_doc(key)
+                    counts["removed"] += 1
+                self._refreshed[aid] = time.time()
+        return counts
+
+    # ----- queries -----
+
+    def _prefix_matches(self, prefix: str) -> Dict[DocKey, float]:
+        """doc key -> best score for any indexed token starting with prefix."""
+        out: Dict[DocKey, float] = {}
+        i = bisect.bisect_left(self._tokens, prefix)
+        while i < len(self._tokens) and self._tokens[i].startswith(prefix):
+            tok = self._tokens[i]
+            bonus = _EXACT_BONUS if tok == prefix else 1.0
+            for key, weight in self._postings[tok].items():
+                score = weight * bonus
+                if score > out.get(key, 0.0):
+                    out[key] = score
+            i += 1
+        return out
+
+    def search(
+        self,
+        query: str,
+        *,
+        aids: Optional[Iterable[str]] = None,
+        groups: Optional[Iterable[str]] = None,
+        offset: int = 0,
+        limit: int = 50,
+    ) -> Tuple[int, List[Dict[str, Any]]]:
+        """Ranked matches for query; returns (total matches, page of hits).
+
+        Score is the sum over query tokens of the best field match (exact beats
+        prefix, id beats title beats type/status), plus a bonus when the title
+        starts with the whole query. Ties go to active, then scheduled, then by title.
+        An empty query lists everything in scope.
+        """
+        aid_set = set(aids) if aids is not None else None
+        group_set = set(groups) if groups else None
+        q_tokens = tokenize(query)
+        q_text = " ".join(q_tokens)
+        with self._lock:
+            if q_tokens:
+                scores: Optional[Dict[DocKey, float]] = None
+                for tok in dict.fromkeys(q_tokens):
+                    matches = self._prefix_matches(tok)
+                    if scores is None:
+                        scores = matches
+                    else:
+                        scores = {k: s + matches[k] for k, s in scores.items() if k in matches}
+                    if not scores:
+                        break
+                scores = scores or {}
+            else:
+                scores = {k: 0.0 for k in self._docs}
+            ranked = []
+            for key, score in scores.items():
+                if aid_set is not None and key[0] not in aid_set:
+                    continue
+                doc = self._docs[key]
+                if group_set is not None and doc["group"] not in group_set:
+                    continue
+                title = doc["fields"]["title"]
+                if q_text and " ".join(tokenize(title)).startswith(q_text):
+                    score += 1.0
+                ranked.append((-score, _STATUS_ORDER.get(doc["group"], 3), title.lower(), key, score, doc))
+        ranked.sort(key=lambda r: r[:4])
+        page = ranked[max(0, offset):max(0, offset) + max(0, limit)]
+        hits = [
+            {"aid": key[0], "id": key[1], "status": doc["group"], "score": round(score, 2), "item": doc["item"]}
+            for _, _, _, key, score, doc in page
+        ]
+        return len(ranked), hits
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Per aid: indexed experience count and seconds since the last full update (None if only pages)."""
+        now = time.time()
+        with self._lock:
+            return {
+                aid: {
+                    "count": len(keys),
+                    "ageSeconds": round(now - self._refreshed[aid], 1) if aid in self._refreshed else None,
+                }
+                for aid, keys in self._by_aid.items()
+                if keys or aid in self._refreshed
+            }
+
+    def has(self, aid: str) -> bool:
+        """Whether any experience of aid is indexed (from a full list or a page)."""
+        with self._lock:
+            return bool(self._by_aid.get(aid))
+
+    def age(self, aid: str) -> Optional[float]:
+        """Seconds since aid's full list was last indexed, or None if never."""
+        with self._lock:
+            ts = self._refreshed.get(aid)
+        return None if ts is None else time.time() - ts
@@ -0,0 +1,25 @@
+"""Gunicorn settings for the dashboard.
+
+Upstream Piano calls can take tens of seconds, so the default profile uses
+threaded workers: a request waiting on Piano parks one thread, not a whole
+worker process, and static files / /api/brands keep being served.
+
+Concurrency limits (all overridable via env):
+- WEB_CONCURRENCY worker processes (default 2)
+- GUNICORN_THREADS threads per worker for gthread (default 32)
+  -> at most WEB_CONCURRENCY * GUNICORN_THREADS requests in flight
+- GUNICORN_WORKER_CLASS=gevent switches to greenlets (requires `pip install gevent`);
+  GUNICORN_WORKER_CONNECTIONS (default 1000) then caps requests per worker
+- PIANO_UPSTREAM_CONCURRENCY caps simultaneous upstream calls per worker (see app.py)
+"""
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '5000')}"
+workers = int(os.environ.get("WEB_CONCURRENCY", "2"))
+worker_class = os.environ.get("GUNICORN_WORKER_CLASS", "gthread")
+threads = int(os.environ.get("GUNICORN_THREADS", "32"))
+worker_connections = int(os.environ.get("GUNICORN_WORKER_CONNECTIONS", "1000"))
+# Long trends ranges stream for a while; don't let the arbiter kill busy workers
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", "120"))
+graceful_timeout = 30
+keepalive = 5
@@ -11,6 +11,10 @@ Features:
   - totals_by_category.csv
   - totals_by_periods_days.csv|weeks.csv|months.csv|quarters.csv|years.csv
   - rows.csv (flattened conversionSetMetadata + metrics)
+- Batch re-parse a directory or glob of saved raw.json files across a process pool,
+  optionally with combined CSVs tagged by source file
+- `sync`: keep a per-day store per (aid, expId), fetch only missing or not-yet-final
+  days, and regenerate CSVs for the range from the store
 
 Bearer token discovery order:
 1) --bearer CLI value
@@ -26,15 +30,20 @@ Usage examples:
   python piano_cli.py --input sampleData.json --out-dir out
   python piano_cli.py --exp-id EXCTYT87DM0F --aid N8sydUSDcX --from 2025-08-24 --to 2025-09-23 --bearer "<paste token>" --save-json --out-dir out
   python piano_cli.py --exp-id EXCTYT87DM0F --aid N8sydUSDcX --bearer-file bearer.txt --out-dir out
+  python piano_cli.py --batch "archive/**/raw.json" --workers 8 --combine --out-dir rebuilt
+  python piano_cli.py sync --exp-id EXCTYT87DM0F --aid N8sydUSDcX --bearer-file bearer.txt --store-dir store --out-dir out
 """
 from __future__ import annotations
 
 import argparse
 import csv
 import datetime as dt
+import glob
 import json
 import os
 import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from pathlib import Path
 from typing import Any, Dict, Iterable, List, Optional
 
@@ -53,6 +62,11 @@ try:
     from piano_lib import build_action_cards_csvs
 except Exception:
     build_action_cards_csvs = None  # type: ignore
+# Optional: report merging for sync
+try:
+    from piano_lib import merge_reports
+except Exception:
+    merge_reports = None  # type: ignore
 
 DEFAULT_BASE_URL = "https://prod-ai-report-api.piano.io/report/composer/conversion"
 DEFAULT_LOCALE = "en_US"
@@ -296,15 +310,217 @@ def export_all(data: Dict[str, Any], out_dir: Path) -> None:
             pass
 
 
+# -----------------------
+# Batch re-parse
+# -----------------------
+
+# CSVs concatenated across inputs by --combine
+COMBINED_CSVS = ("rows.csv", "action_cards.csv", "action_card_terms.csv")
+
+
+def collect_batch_inputs(spec: str) -> List[Path]:
+    """Resolve a directory (searched recursively for *.json) or glob pattern to files."""
+    path = Path(spec)
+    if path.is_dir():
+        return sorted(p for p in path.rglob("*.json") if p.is_file())
+    return sorted(Path(p) for p in glob.glob(spec, recursive=True) if Path(p).is_file())
+
+
+def batch_output_names(files: List[Path]) -> Dict[Path, str]:
+    """Unique output subdirectory name per input, from its path below the common parent.
+
+    e.g. archive/2025-09-01/raw.json -> "2025-09-01__raw"
+    """
+    if not files:
+        return {}
+    parents = [str(f.resolve().parent) for f in files]
+    base = Path(os.path.commonpath(parents))
+    names: Dict[Path, str] = {}
+    for f in files:
+        rel = f.resolve().relative_to(base).with_suffix("")
+        names[f] = "__".join(rel.parts)
+    return names
+
+
+def _parse_one(job: tuple) -> tuple:
+    """Process-pool worker: parse one saved report and export its CSVs.
+
+    Returns (input path, output dir, error or None).
+    """
+    src, dest = job
+    try:
+        with Path(src).open("r", encoding="utf-8") as f:
+            data = json.load(f)
+        ensure_out_dir(Path(dest))
+        export_all(data, Path(dest))
+    except Exception as exc:
+        return src, dest, f"{type(exc).__name__}: {exc}"
+    return src, dest, None
+
+
+def write_combined_csvs(results: List[tuple], out_dir: Path) -> None:
+    """Concatenate per-input CSVs into out_dir/combined_<name> with a leading source_file column."""
+    for name in COMBINED_CSVS:
+        writer = None
+        with (out_dir / f"combined_{name}").open("w", newline="", encoding="utf-8") as out:
+            for src, dest, err in results:
+                part = Path(dest) / name
+                if err or not part.exists():
+                    continue
+                with part.open("r", newline="", encoding="utf-8") as f:
+                    reader = csv.reader(f)
+                    header = next(reader, None)
+                    if header is None:
+                        continue
+                    if writer is None:
+                        writer = csv.writer(out)
+                        writer.writerow(["source_file"] + header)
+                    for row in reader:
+                        writer.writerow([src] + row)
+
+
+def run_batch(spec: str, out_dir: Path, workers: Optional[int] = None, combine: bool = False) -> int:
+    files = collect_batch_inputs(spec)
+    if not files:
+        print(f"No JSON files matched {spec}", file=sys.stderr)
+        return 1
+    names = batch_output_names(files)
+    jobs = [(str(f), str(out_dir / names[f])) for f in files]
+    workers = max(1, workers or os.cpu_count() or 1)
+
+    started = time.perf_counter()
+    if workers == 1 or len(jobs) == 1:
+        results = [_parse_one(job) for job in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(jobs))) as pool:
+            results = list(pool.map(_parse_one, jobs, chunksize=max(1, len(jobs) // (workers * 4))))
+    if combine:
+        write_combined_csvs(results, out_dir)
+    elapsed = time.perf_counter() - started
+
+    failed = [(src, err) for src, _, err in results if err]
+    for src, err in failed:
+        print(f"Failed {src}: {err}", file=sys.stderr)
+    rate = len(results) / elapsed if elapsed > 0 else float("inf")
+    print(f"Parsed {len(results) - len(failed)}/{len(results)} files with {workers} workers in {elapsed:.2f}s ({rate:.1f} files/s) -> {out_dir}")
+    return 1 if failed else 0
+
+
+# -----------------------
+# Incremental sync
+# -----------------------
+
+# Days this close to the fetch date may still change upstream and are refetched
+DEFAULT_SETTLE_DAYS = 2
+
+
+def store_path(store_dir: Path, aid: str, exp_id: str) -> Path:
+    return store_dir / aid / exp_id
+
+
+def load_manifest(store: Path) -> Dict[str, Any]:
+    path = store / "manifest.json"
+    if not path.exists():
+        return {"days": {}}
+    with path.open("r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def day_is_final(day: str, fetched_at: str, settle_days: int) -> bool:
+    """A stored day is final once it was fetched at least settle_days after it ended."""
+    fetched = dt.datetime.fromisoformat(fetched_at).date()
+    return (fetched - dt.date.fromisoformat(day)).days >= settle_days
+
+
+def days_to_fetch(store: Path, manifest: Dict[str, Any], from_date: str, to_date: str, settle_days: int) -> List[str]:
+    """Days in the range that are missing from the store or not yet final."""
+    start, end = dt.date.fromisoformat(from_date), dt.date.fromisoformat(to_date)
+    out: List[str] = []
+    cur = start
+    while cur <= end:
+        day = cur.isoformat()
+        entry = manifest["days"].get(day)
+        if not entry or not (store / "days" / f"{day}.json").exists() or not day_is_final(day, entry["fetched_at"], settle_days):
+            out.append(day)
+        cur += dt.timedelta(days=1)
+    return out
+
+
+def run_sync(args: argparse.Namespace, aid: str) -> int:
+    if merge_reports is None:  # pragma: no cover
+        print("sync requires piano_lib.merge_reports (run from the project root)", file=sys.stderr)
+        return 1
+    store = store_path(args.store_dir, aid, args.exp_id)
+    ensure_out_dir(store / "days")
+    manifest = load_manifest(store)
+    missing = days_to_fetch(store, manifest, args.from_date, args.to_date, args.settle_days)
+
+    if missing:
+        bearer = resolve_bearer(args.bearer, args.bearer_file, DEFAULT_BEARER_ENV)
+        if not bearer:  # pragma: no cover
+            print("Bearer token not provided. Use --bearer, --bearer-file, or set PIANO_BEARER.", file=sys.stderr)
+            return 2
+
+        def fetch_day(day: str) -> tuple:
+            try:
+                data = fetch_conversion_report(
+                    base_url=args.base_url,
+                    exp_id=args.exp_id,
+                    aid=aid,
+                    locale=DEFAULT_LOCALE,
+                    from_date=day,
+                    to_date=day,
+                    bearer=bearer,
+                    timeout=args.timeout,
+                )
+            except Exception as exc:
+                return day, None, str(exc)
+            save_json(store / "days" / f"{day}.json", data)
+            return day, dt.datetime.now().isoformat(timespec="seconds"), None
+
+        with ThreadPoolExecutor(max_workers=max(1, min(args.workers or 4, len(missing)))) as pool:
+            results = list(pool.map(fetch_day, missing))
+        failed = [(day, err) for day, _, err in results if err]
+        for day, fetched_at, err in results:
+            if not err:
+                manifest["days"][day] = {"fetched_at": fetched_at}
+        save_json(store / "manifest.json", manifest)
+        for day, err in failed:
+            print(f"Fetch failed for {day}: {err}", file=sys.stderr)
+        if failed:
+            print(f"{len(failed)} day(s) failed; outputs not regenerated", file=sys.stderr)
+            return 3
+
+    reports: List[Dict[str, Any]] = []
+    cur, end = dt.date.fromisoformat(args.from_date), dt.date.fromisoformat(args.to_date)
+    while cur <= end:
+        with (store / "days" / f"{cur.isoformat()}.json").open("r", encoding="utf-8") as f:
+            reports.append(json.load(f))
+        cur += dt.timedelta(days=1)
+    data = merge_reports(reports, args.from_date, args.to_date)
+
+    if args.save_json:
+        save_json(args.out_dir / "raw.json", data)
+    export_all(data, args.out_dir)
+    print(f"Synced {args.from_date}..{args.to_date}: fetched {len(missing)} day(s), {len(reports) - len(missing)} from store -> {args.out_dir}")
+    return 0
+
+
 # -----------------------
 # CLI
 # -----------------------
 
 def build_arg_parser() -> argparse.ArgumentParser:
     parser = argparse.ArgumentParser(description="Fetch and parse Piano conversion report")
+    parser.add_argument("command", nargs="?", choices=["sync"], help="sync: fetch only days missing from --store-dir, then export the range from the store")
 
     # Input modes
     parser.add_argument("--input", "-i", type=Path, help="Parse from existing JSON file instead of fetching")
+    parser.add_argument("--batch", help="Re-parse every saved report in a directory or glob (e.g. 'archive/**/raw.json') into per-file subdirectories of --out-dir")
+    parser.add_argument("--workers", type=int, help="Processes for --batch (default: CPU count); parallel day fetches for sync (default 4)")
+    parser.add_argument("--combine", action="store_true", help="With --batch, also write combined_rows.csv and combined action card CSVs with a source_file column")
+    parser.add_argument("--store-dir", type=Path, default=Path("store"), help="sync: per-day report store (store/<aid>/<expId>/days/*.json)")
+    parser.add_argument("--settle-days", type=int, default=DEFAULT_SETTLE_DAYS, help=f"sync: refetch days until they were fetched this many days after they ended (default {DEFAULT_SETTLE_DAYS})")
 
     # API params
     from_default, to_default = default_dates()
@@ -337,6 +553,12 @@ def main(argv: Optional[List[str]] = None) -> int:
     out_dir: Path = args.out_dir
     ensure_out_dir(out_dir)
 
+    if args.batch:
+        return run_batch(args.batch, out_dir, workers=args.workers, combine=args.combine)
+
+    if args.command == "sync":
+        return run_sync(args, resolve_aid(args.brand) or args.aid)
+
     if args.input:
         # Local parse mode
         try:
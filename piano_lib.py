@@ -1,16 +1,246 @@
 from __future__ import annotations
 
+import copy
 import csv
+import datetime as dt
+import hashlib
 import io
 import json
-from typing import Any, Dict, Iterable, List, Tuple
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from urllib.parse import urlsplit
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
 
 import requests
 
+from profiling import propagate, stage
+
 DEFAULT_BASE_URL = "https://prod-ai-report-api.piano.io/report/composer/conversion"
 
+# Caps simultaneous upstream calls in this process so many waiting users queue
+# here instead of opening one Piano connection each. See set_upstream_limit.
+_UPSTREAM_SLOTS = threading.BoundedSemaphore(16)
+
+
+def set_upstream_limit(limit: int) -> None:
+    """Set the max number of concurrent upstream calls for this process."""
+    global _UPSTREAM_SLOTS
+    _UPSTREAM_SLOTS = threading.BoundedSemaphore(max(1, int(limit)))
+
+
+class DeadlineExceeded(TimeoutError):
+    """The request's deadline passed before the upstream call could finish."""
+
 
-def fetch_conversion_report(*, base_url: str, exp_id: str, aid: str, locale: str, from_date: str, to_date: str, bearer: str, timeout: int = 30) -> Dict[str, Any]:
+def remaining_budget(deadline: Optional[float]) -> Optional[float]:
+    """Seconds left until a time.monotonic() deadline (None = no deadline)."""
+    return None if deadline is None else deadline - time.monotonic()
+
+
+@contextmanager
+def upstream_slot(deadline: Optional[float] = None):
+    """Hold one upstream slot for the duration of a Piano call.
+
+    Waiting for a slot counts against the deadline.
+    """
+    slots = _UPSTREAM_SLOTS
+    left = remaining_budget(deadline)
+    if left is None:
+        slots.acquire()
+    elif left <= 0 or not slots.acquire(timeout=left):
+        raise DeadlineExceeded("deadline exceeded waiting for an upstream slot")
+    try:
+        yield
+    finally:
+        slots.release()
+
+
+# Recent successful upstream latencies (seconds) per kind of call, used to pick
+# hedge delays. A month chunk is naturally slower than a one-day slice, so each
+# (endpoint, range size) keeps its own window; see latency_key.
+_LATENCIES: Dict[Tuple[str, str], deque] = {}
+_LATENCY_LOCK = threading.Lock()
+# Minimum samples before hedging kicks in; until then calls are not hedged
+_HEDGE_MIN_SAMPLES = 20
+_HEDGE_POOL = ThreadPoolExecutor(max_workers=32, thread_name_prefix="piano-hedge")
+
+
+def latency_key(url: str, from_date: Optional[str] = None, to_date: Optional[str] = None) -> Tuple[str, str]:
+    """(host + path, range bucket) identifying calls with comparable latency.
+
+    Ranges are bucketed as day, week (<= 7 days), month (<= 31 days) or longer;
+    calls without a parsable range share the "" bucket of their endpoint.
+    """
+    parts = urlsplit(url)
+    bucket = ""
+    try:
+        days = (dt.date.fromisoformat(str(to_date)) - dt.date.fromisoformat(str(from_date))).days + 1
+        bucket = "day" if days <= 1 else "week" if days <= 7 else "month" if days <= 31 else "longer"
+    except ValueError:
+        pass
+    return parts.netloc + parts.path, bucket
+
+
+def _record_latency(key: Tuple[str, str], seconds: float) -> None:
+    with _LATENCY_LOCK:
+        window = _LATENCIES.get(key)
+        if window is None:
+            window = _LATENCIES[key] = deque(maxlen=500)
+        window.append(seconds)
+
+
+def hedge_delay(percentile: float, key: Tuple[str, str]) -> Optional[float]:
+    """Latency at the given percentile of recent calls of the same kind, or None if too few samples."""
+    with _LATENCY_LOCK:
+        samples = sorted(_LATENCIES.get(key) or ())
+    if percentile <= 0 or len(samples) < _HEDGE_MIN_SAMPLES:
+        return None
+    idx = min(len(samples) - 1, int(len(samples) * percentile / 100.0))
+    return samples[idx]
+
+
+class UpstreamAuthError(RuntimeError):
+    """Piano rejected the token (401/403); it is cached as invalid for a cool-down."""
+
+    def __init__(self, message: str, retry_after: float = 0):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class CircuitOpenError(RuntimeError):
+    """The upstream host's circuit is open; calls fail fast until it is probed again."""
+
+    def __init__(self, message: str, retry_after: float = 0):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+# Circuit breaker settings; see configure_breaker
+_BREAKER = {"failures": 5, "cooldown": 30.0, "auth_cooldown": 300.0}
+_BREAKER_LOCK = threading.Lock()
+# host -> {"state": "closed"|"open"|"half_open", "failures", "opened_at", "probe"}
+_HOSTS: Dict[str, Dict[str, Any]] = {}
+# sha256(token)[:16] -> monotonic time the token may be retried
+_INVALID_TOKENS: Dict[str, float] = {}
+
+
+def configure_breaker(*, failures: int, cooldown: float, auth_cooldown: float) -> None:
+    """Consecutive 5xx/timeouts that open a host circuit, how long it stays open,
+    and how long a rejected token is failed fast."""
+    _BREAKER.update({"failures": max(1, int(failures)), "cooldown": float(cooldown), "auth_cooldown": float(auth_cooldown)})
+
+
+def token_key(token: Optional[str]) -> Optional[str]:
+    """Short sha256 fingerprint of a bearer token, for keying caches and the invalid-token list."""
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()[:16] if token else None
+
+
+def _breaker_check(host: str, tkey: Optional[str]) -> None:
+    now = time.monotonic()
+    with _BREAKER_LOCK:
+        if tkey:
+            until = _INVALID_TOKENS.get(tkey)
+            if until is not None:
+                if now < until:
+                    raise UpstreamAuthError("Token invalid or expired (rejected recently); refresh it and retry", until - now)
+                del _INVALID_TOKENS[tkey]
+        h = _HOSTS.get(host)
+        if not h or h["state"] == "closed":
+            return
+        if h["state"] == "open":
+            retry_in = h["opened_at"] + _BREAKER["cooldown"] - now
+            if retry_in > 0:
+                raise CircuitOpenError(f"Upstream {host} unavailable (circuit open)", retry_in)
+            h["state"] = "half_open"
+            h["probe"] = False
+        # half-open: let exactly one probe through
+        if h["probe"]:
+            raise CircuitOpenError(f"Upstream {host} unavailable (probing)", _BREAKER["cooldown"])
+        h["probe"] = True
+
+
+def _breaker_record(host: str, outcome: str) -> None:
+    """outcome: "ok", "fail" (5xx/timeout/connection) or "neutral" (no signal about the host)."""
+    with _BREAKER_LOCK:
+        h = _HOSTS.setdefault(host, {"state": "closed", "failures": 0, "opened_at": 0.0, "probe": False})
+        probing = h["state"] == "half_open"
+        h["probe"] = False
+        if outcome == "ok":
+            h.update({"state": "closed", "failures": 0})
+        elif outcome == "fail":
+            h["failures"] += 1
+            if probing or h["failures"] >= _BREAKER["failures"]:
+                h.update({"state": "open", "opened_at": time.monotonic()})
+
+
+def breaker_status(token: Optional[str] = None) -> Dict[str, Any]:
+    """Snapshot of host circuits and, if given, whether token is currently marked invalid."""
+    now = time.monotonic()
+    with _BREAKER_LOCK:
+        hosts = {
+            host: {
+                "state": h["state"],
+                "failures": h["failures"],
+                "retryAfter": max(0.0, round(h["opened_at"] + _BREAKER["cooldown"] - now, 1)) if h["state"] == "open" else 0,
+            }
+            for host, h in _HOSTS.items()
+        }
+        out: Dict[str, Any] = {"hosts": hosts}
+        key = token_key(token)
+        if key:
+            until = _INVALID_TOKENS.get(key)
+            out["token"] = {"valid": not (until and until > now), "retryAfter": max(0.0, round(until - now, 1)) if until else 0}
+    return out
+
+
+def guarded_get(url: str, *, params: Dict[str, Any], headers: Dict[str, str], timeout: float, token: Optional[str] = None, deadline: Optional[float] = None, kind: Optional[Tuple[str, str]] = None) -> requests.Response:
+    """GET through the upstream slot limit, the host circuit breaker and the token-validity cache.
+
+    Successful latencies are recorded under kind (default: the endpoint, see latency_key).
+
+    Raises UpstreamAuthError on 401/403 (and marks the token invalid), CircuitOpenError
+    when failing fast, DeadlineExceeded when the budget runs out, and
+    requests.HTTPError for other error statuses.
+    """
+    host = urlsplit(url).netloc
+    tkey = token_key(token)
+    _breaker_check(host, tkey)
+    outcome = "neutral"
+    try:
+        with upstream_slot(deadline):
+            left = remaining_budget(deadline)
+            if left is not None and left <= 0:
+                raise DeadlineExceeded(f"deadline exceeded before calling {host}")
+            started = time.monotonic()
+            try:
+                resp = requests.get(url, params=params, headers=headers, timeout=timeout if left is None else min(timeout, left))
+            except requests.Timeout as exc:
+                if deadline is not None and time.monotonic() >= deadline:
+                    raise DeadlineExceeded(f"deadline exceeded calling {host}") from exc
+                outcome = "fail"
+                raise
+            except requests.ConnectionError:
+                outcome = "fail"
+                raise
+        if resp.status_code in (401, 403):
+            outcome = "ok"
+            if tkey:
+                with _BREAKER_LOCK:
+                    _INVALID_TOKENS[tkey] = time.monotonic() + _BREAKER["auth_cooldown"]
+            raise UpstreamAuthError(f"HTTP {resp.status_code}: token invalid or expired", _BREAKER["auth_cooldown"])
+        outcome = "fail" if resp.status_code >= 500 else "ok"
+        resp.raise_for_status()
+        _record_latency(kind or latency_key(url), time.monotonic() - started)
+        return resp
+    finally:
+        _breaker_record(host, outcome)
+
+
+def fetch_conversion_report(*, base_url: str, exp_id: str, aid: str, locale: str, from_date: str, to_date: str, bearer: str, timeout: int = 30, deadline: Optional[float] = None) -> Dict[str, Any]:
     params = {
         "expId": exp_id,
         "aid": aid,
@@ -23,9 +253,325 @@ def fetch_conversion_report(*, base_url: str, exp_id: str, aid: str, locale: str
         "Accept": "application/json",
         "User-Agent": "piano-data-scraper/1.0",
     }
-    resp = requests.get(base_url, params=params, headers=headers, timeout=timeout)
-    resp.raise_for_status()
-    return resp.json()
+    with stage("fetch"):
+        resp = guarded_get(
+            base_url, params=params, headers=headers, timeout=timeout, token=bearer, deadline=deadline,
+            kind=latency_key(base_url, from_date, to_date),
+        )
+    with stage("parse"):
+        return resp.json()
+
+
+def fetch_conversion_report_hedged(*, hedge_percentile: float = 0, **kwargs: Any) -> Dict[str, Any]:
+    """fetch_conversion_report, plus a duplicate request if the first is slower than
+    hedge_percentile of recent calls for the same endpoint and range size.
+
+    Whichever call succeeds first wins; a failure only surfaces once both have
+    failed. The losing call is not cancelled (requests can't be) but its result is
+    discarded. Without enough samples (or with hedge_percentile 0) this is a plain fetch.
+    """
+    hedge_after = hedge_delay(hedge_percentile, latency_key(kwargs["base_url"], kwargs.get("from_date"), kwargs.get("to_date")))
+    if hedge_after is None:
+        return fetch_conversion_report(**kwargs)
+    deadline = kwargs.get("deadline")
+    fetch = propagate(fetch_conversion_report)
+    primary = _HEDGE_POOL.submit(fetch, **kwargs)
+    left = remaining_budget(deadline)
+    first_wait = hedge_after if left is None else max(0.0, min(hedge_after, left))
+    done, _ = wait([primary], timeout=first_wait)
+    if done:
+        return primary.result()
+    pending = {primary, _HEDGE_POOL.submit(fetch, **kwargs)}
+    errors: List[BaseException] = []
+    while pending:
+        left = remaining_budget(deadline)
+        done, pending = wait(pending, timeout=None if left is None else max(0.0, left), return_when=FIRST_COMPLETED)
+        if not done:
+            raise DeadlineExceeded(f"deadline exceeded fetching {kwargs.get('from_date')}..{kwargs.get('to_date')}")
+        for fut in done:
+            exc = fut.exception()
+            if exc is None:
+                return fut.result()
+            errors.append(exc)
+    raise errors[0]
+
+
+# ---------- Range splitting and report merging
+
+# Per-chunk report cache: key -> (fetched_at, report); bounded, see prune_cache
+_CHUNK_CACHE: Dict[tuple, Tuple[float, Dict[str, Any]]] = {}
+_CHUNK_CACHE_MAX = 256
+# Piano reports days in the publisher's zone; used until a report says otherwise
+DEFAULT_REPORT_ZONE = "America/New_York"
+# Days after a day ends before its numbers stop changing upstream (as piano_cli sync)
+SETTLE_DAYS = 2
+
+
+def prune_cache(cache: Dict[Any, tuple], *, max_age: float, max_entries: int) -> None:
+    """Drop entries (key -> (stored_at, ...)) older than max_age, then the oldest beyond max_entries."""
+    now = time.time()
+    # list() snapshots the dict, which worker threads may be writing to
+    items = sorted(list(cache.items()), key=lambda kv: kv[1][0])
+    fresh = [k for k, v in items if now - v[0] < max_age]
+    drop = {k for k, _ in items} - set(fresh[len(fresh) - max_entries:] if max_entries > 0 else ())
+    for k in drop:
+        cache.pop(k, None)
+
+
+def report_today(report: Optional[Dict[str, Any]] = None) -> dt.date:
+    """Today's date in the report's zone (params.dateTimeRange.zone), else DEFAULT_REPORT_ZONE."""
+    zone = (((report or {}).get("params") or {}).get("dateTimeRange") or {}).get("zone") or DEFAULT_REPORT_ZONE
+    try:
+        tz: Any = ZoneInfo(zone)
+    except (ZoneInfoNotFoundError, ValueError):
+        tz = dt.timezone.utc
+    return dt.datetime.now(tz).date()
+
+
+def chunk_is_settled(end_date: str, report: Optional[Dict[str, Any]] = None, settle_days: int = SETTLE_DAYS) -> bool:
+    """True once end_date is at least settle_days in the past in the report's zone."""
+    return (report_today(report) - dt.date.fromisoformat(end_date)).days >= settle_days
+
+
+def split_range(from_date: str, to_date: str, unit: str = "months") -> List[Tuple[str, str]]:
+    """Split an inclusive ISO date range into calendar-aligned (from, to) chunks.
+
+    unit is "months" (calendar months) or "days". The first and last chunks are
+    clipped to the requested range, so interior chunks are always whole months and
+    can be reused by any later range that covers them.
+    """
+    start = dt.date.fromisoformat(from_date)
+    end = dt.date.fromisoformat(to_date)
+    if end < start:
+        raise ValueError(f"Invalid range: {from_date} > {to_date}")
+    out: List[Tuple[str, str]] = []
+    if unit == "days":
+        cur = start
+        while cur <= end:
+            out.append((cur.isoformat(), cur.isoformat()))
+            cur += dt.timedelta(days=1)
+        return out
+    if unit != "months":
+        raise ValueError(f"Unsupported chunk unit: {unit}")
+    cur = start
+    while cur <= end:
+        if cur.month == 12:
+            next_month = dt.date(cur.year + 1, 1, 1)
+        else:
+            next_month = dt.date(cur.year, cur.month + 1, 1)
+        chunk_end = min(next_month - dt.timedelta(days=1), end)
+        out.append((cur.isoformat(), chunk_end.isoformat()))
+        cur = next_month
+    return out
+
+
+def _rate(conversions: Any, exposures: Any) -> Optional[float]:
+    return (conversions / exposures) if exposures else None
+
+
+def _key_of(obj: Any) -> str:
+    return json.dumps(obj, sort_keys=True, default=str)
+
+
+def _sum_into(target: Dict[str, Any], src: Dict[str, Any], fields: Iterable[str]) -> None:
+    for f in fields:
+        if src.get(f) is None:
+            continue
+        target[f] = (target.get(f) or 0) + src[f]
+
+
+def _merge_keyed(lists: Iterable[List[Dict[str, Any]]], key_field: str, fields: Iterable[str]) -> List[Dict[str, Any]]:
+    """Merge lists of dicts by the JSON of key_field, summing fields and recomputing conversionRate.
+
+    First-seen order is preserved; non-additive fields are taken from the first occurrence.
+    """
+    fields = list(fields)
+    merged: Dict[str, Dict[str, Any]] = {}
+    for items in lists:
+        for item in items or []:
+            if not isinstance(item, dict):
+                continue
+            k = _key_of(item.get(key_field))
+            cur = merged.get(k)
+            if cur is None:
+                merged[k] = copy.deepcopy(item)
+                continue
+            _sum_into(cur, item, fields)
+            if "changed" in item:
+                cur["changed"] = bool(cur.get("changed")) or bool(item.get("changed"))
+    out = list(merged.values())
+    for item in out:
+        if "conversionRate" in item:
+            item["conversionRate"] = _rate(item.get("conversions"), item.get("exposures"))
+    return out
+
+
+def _merge_insights(reports: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """Sum insights revenue (top + additional, {currency, value}) per currency across chunks.
+
+    top stays the first chunk's top currency; the other currencies go to additional.
+    """
+    present = [r["insights"] for r in reports if isinstance(r.get("insights"), dict)]
+    if not present:
+        return None
+    entries = _merge_keyed(
+        ([i.get("top")] + list(i.get("additional") or []) for i in present),
+        "currency",
+        ("value",),
+    )
+    top_currency = (present[0].get("top") or {}).get("currency")
+    out = copy.deepcopy(present[0])
+    top = next((e for e in entries if e.get("currency") == top_currency), None)
+    if top is not None:
+        out["top"] = top
+    out["additional"] = [e for e in entries if e is not top]
+    return out
+
+
+def merge_reports(reports: List[Dict[str, Any]], from_date: Optional[str] = None, to_date: Optional[str] = None) -> Dict[str, Any]:
+    """Merge conversion reports for adjacent date chunks into one report.
+
+    - exposures/conversions/value are summed (top level, totals, rows, groupings,
+      termsPerformances); conversionRate is recomputed from the sums
+    - rows are merged by conversionSetMetadata, so a row's exposures are the
+      action card's exposures over the whole range and the max-per-action-card
+      rule used by the CSV builders still applies
+    - totalsByPeriods lists are concatenated per period; a period that straddles
+      a chunk boundary (e.g. a week) is merged by date
+    - insights revenue (top/additional values) is summed per currency
+    - params.dateTimeRange is rewritten to the merged range; other non-additive
+      fields (rootCardParams, ...) are taken from the first chunk
+    """
+    reports = [r for r in reports if isinstance(r, dict)]
+    if not reports:
+        return {}
+    if len(reports) == 1:
+        return reports[0]
+    out = copy.deepcopy(reports[0])
+
+    for f in ("conversions", "exposures"):
+        if any(r.get(f) is not None for r in reports):
+            out[f] = sum(r.get(f) or 0 for r in reports)
+    if "conversionRate" in out:
+        out["conversionRate"] = _rate(out.get("conversions"), out.get("exposures"))
+
+    totals: Dict[str, Any] = copy.deepcopy(reports[0].get("totals") or {})
+    for r in reports[1:]:
+        t = r.get("totals") or {}
+        _sum_into(totals, t, ("conversions", "exposures"))
+        for sub in ("totalsBySource", "totalsByCategory"):
+            if isinstance(t.get(sub), dict):
+                dst = totals.setdefault(sub, {})
+                _sum_into(dst, t[sub], t[sub].keys())
+    out["totals"] = totals
+
+    tbp: Dict[str, Any] = {}
+    periods = []
+    for r in reports:
+        for period in (r.get("totalsByPeriods") or {}):
+            if period not in periods:
+                periods.append(period)
+    for period in periods:
+        tbp[period] = _merge_keyed(
+            ((r.get("totalsByPeriods") or {}).get(period) or [] for r in reports),
+            "date",
+            ("exposures", "conversions"),
+        )
+    out["totalsByPeriods"] = tbp
+
+    out["rows"] = _merge_keyed((r.get("rows") or [] for r in reports), "conversionSetMetadata", ("exposures", "conversions", "value"))
+    out["termsPerformances"] = _merge_keyed((r.get("termsPerformances") or [] for r in reports), "key", ("exposures", "conversions", "value"))
+
+    groupings: Dict[str, Dict[str, Any]] = {}
+    for r in reports:
+        for g in r.get("groupings") or []:
+            name = _key_of(g.get("aspect"))
+            groupings.setdefault(name, {"aspect": copy.deepcopy(g.get("aspect")), "lists": []})["lists"].append(g.get("groupTotals") or [])
+    if groupings:
+        out["groupings"] = [
+            {**{k: v for k, v in g.items() if k != "lists"}, "groupTotals": _merge_keyed(g["lists"], "groupingKey", ("exposures", "conversions", "value"))}
+            for g in groupings.values()
+        ]
+
+    insights = _merge_insights(reports)
+    if insights is not None:
+        out["insights"] = insights
+
+    rng = ((out.get("params") or {}).get("dateTimeRange"))
+    if isinstance(rng, dict):
+        first = ((reports[0].get("params") or {}).get("dateTimeRange")) or {}
+        last = ((reports[-1].get("params") or {}).get("dateTimeRange")) or {}
+        rng["startDate"] = from_date or first.get("startDate")
+        rng["endDate"] = to_date or last.get("endDate")
+        for f in ("end", "endUtc"):
+            if f in last:
+                rng[f] = last[f]
+    return out
+
+
+def fetch_conversion_report_chunked(
+    *,
+    base_url: str,
+    exp_id: str,
+    aid: str,
+    locale: str,
+    from_date: str,
+    to_date: str,
+    bearer: str,
+    timeout: int = 30,
+    unit: str = "months",
+    max_workers: int = 4,
+    cache_ttl: int = 300,
+    closed_cache_ttl: int = 86400,
+    deadline: Optional[float] = None,
+    hedge_percentile: float = 0,
+    settle_days: int = SETTLE_DAYS,
+) -> Dict[str, Any]:
+    """Fetch a range as calendar-aligned chunks in parallel and merge them.
+
+    Each chunk is cached independently in _CHUNK_CACHE, keyed by bearer
+    fingerprint as well, so only the token that fetched a chunk is served it and
+    overlapping ranges share their whole months. Chunks that ended at least settle_days ago (in the
+    report's zone) no longer change upstream and are kept for closed_cache_ttl
+    seconds; more recent chunks expire after cache_ttl seconds. The cache holds
+    at most _CHUNK_CACHE_MAX reports. deadline/hedge_percentile are passed to
+    every chunk fetch (see fetch_conversion_report_hedged).
+    """
+    chunks = split_range(from_date, to_date, unit)
+    bearer_key = token_key(bearer)
+
+    def one(chunk: Tuple[str, str]) -> Dict[str, Any]:
+        s, e = chunk
+        key = (base_url, exp_id, aid, locale, bearer_key, s, e)
+        now_ts = time.time()
+        cached = _CHUNK_CACHE.get(key)
+        if cached:
+            ttl = closed_cache_ttl if chunk_is_settled(e, cached[1], settle_days) else cache_ttl
+            if (now_ts - cached[0]) < ttl:
+                return cached[1]
+        data = fetch_conversion_report_hedged(
+            base_url=base_url,
+            exp_id=exp_id,
+            aid=aid,
+            locale=locale,
+            from_date=s,
+            to_date=e,
+            bearer=bearer,
+            timeout=timeout,
+            deadline=deadline,
+            hedge_percentile=hedge_percentile,
+        )
+        _CHUNK_CACHE[key] = (now_ts, data)
+        if len(_CHUNK_CACHE) > _CHUNK_CACHE_MAX:
+            prune_cache(_CHUNK_CACHE, max_age=max(cache_ttl, closed_cache_ttl), max_entries=_CHUNK_CACHE_MAX)
+        return data
+
+    if len(chunks) == 1:
+        return one(chunks[0])
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(chunks))), thread_name_prefix="piano-chunk") as pool:
+        reports = list(pool.map(propagate(one), chunks))
+    with stage("aggregate"):
+        return merge_reports(reports, from_date, to_date)
 
 
 def _as_number(value: Any) -> Any:
@@ -35,12 +581,13 @@ def _as_number(value: Any) -> Any:
 # ---------- CSV building helpers (in-memory)
 
 def _write_csv_to_string(rows: Iterable[Dict[str, Any]], fieldnames: List[str]) -> str:
-    output = io.StringIO()
-    writer = csv.DictWriter(output, fieldnames=fieldnames)
-    writer.writeheader()
-    for row in rows:
-        writer.writerow({k: row.get(k) for k in fieldnames})
-    return output.getvalue()
+    with stage("serialize"):
+        output = io.StringIO()
+        writer = csv.DictWriter(output, fieldnames=fieldnames)
+        writer.writeheader()
+        for row in rows:
+            writer.writerow({k: row.get(k) for k in fieldnames})
+        return output.getvalue()
 
 
 def build_summary_totals_csvs(data: Dict[str, Any]) -> Tuple[str, str, str]:
@@ -178,6 +725,126 @@ def build_all_csvs(data: Dict[str, Any]) -> Dict[str, str]:
     return out
 
 
+# -----------------------
+# Pivot cube
+# -----------------------
+
+PIVOT_DIMENSIONS: Tuple[str, ...] = ("category", "source", "term", "template", "actionCard", "splitTest")
+
+
+def _pivot_dims(meta: Dict[str, Any]) -> Tuple[Any, ...]:
+    def scalar(v: Any) -> Any:
+        return v if v is None or isinstance(v, (str, int, float, bool)) else _key_of(v)
+
+    term = meta.get("term") or {}
+    return (
+        (meta.get("category") or {}).get("id"),
+        (meta.get("source") or {}).get("id"),
+        term.get("name") or term.get("id"),
+        (meta.get("template") or {}).get("name"),
+        (meta.get("actionCard") or {}).get("id"),
+        scalar(meta.get("splitTest")),
+    )
+
+
+def _merge_cell(dst: Dict[str, Any], src: Dict[str, Any]) -> None:
+    dst["conversions"] += src["conversions"]
+    dst["value"] += src["value"]
+    dst["rows"] += src["rows"]
+    for ac, exp in src["exposures_by_ac"].items():
+        if exp > dst["exposures_by_ac"].get(ac, 0):
+            dst["exposures_by_ac"][ac] = exp
+
+
+def build_pivot_cube(data: Dict[str, Any]) -> Dict[str, Any]:
+    """Aggregate report rows into cells keyed by all PIVOT_DIMENSIONS.
+
+    Conversions and value are summed. Exposures are not additive across rows of the
+    same action card, so each cell keeps the max exposures per action card (the rule
+    used by build_action_cards_csvs) and exposures are summed across cards only when
+    a query is answered. Rollups to fewer dimensions are memoised in cube["rollups"].
+    """
+    cells: Dict[Tuple[Any, ...], Dict[str, Any]] = {}
+    for r in data.get("rows") or []:
+        if not isinstance(r, dict):
+            continue
+        meta = r.get("conversionSetMetadata") or {}
+        key = _pivot_dims(meta)
+        ac = key[4] or ""
+        row_cell = {
+            "conversions": r.get("conversions") or 0,
+            "value": r.get("value") or 0,
+            "rows": 1,
+            "exposures_by_ac": {ac: r.get("exposures") or 0},
+        }
+        cell = cells.get(key)
+        if cell is None:
+            cells[key] = row_cell
+        else:
+            _merge_cell(cell, row_cell)
+    return {"dims": PIVOT_DIMENSIONS, "cells": cells, "rollups": {}}
+
+
+def _rollup(cube: Dict[str, Any], dims: Tuple[str, ...]) -> Dict[Tuple[Any, ...], Dict[str, Any]]:
+    cached = cube["rollups"].get(dims)
+    if cached is not None:
+        return cached
+    idx = [PIVOT_DIMENSIONS.index(d) for d in dims]
+    out: Dict[Tuple[Any, ...], Dict[str, Any]] = {}
+    for key, cell in cube["cells"].items():
+        sub = tuple(key[i] for i in idx)
+        dst = out.get(sub)
+        if dst is None:
+            out[sub] = {"conversions": 0, "value": 0, "rows": 0, "exposures_by_ac": {}}
+            dst = out[sub]
+        _merge_cell(dst, cell)
+    cube["rollups"][dims] = out
+    return out
+
+
+def query_pivot_cube(cube: Dict[str, Any], group_by: Iterable[str], filters: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+    """Group-by/filter query over a cube built by build_pivot_cube.
+
+    filters maps a dimension to a value or list of accepted values. Returns one
+    dict per group with the dimension values plus conversions, value, exposures
+    and conversionRate, sorted by conversions descending.
+    """
+    group_by = list(group_by)
+    filters = {k: (v if isinstance(v, list) else [v]) for k, v in (filters or {}).items()}
+    unknown = [d for d in list(group_by) + list(filters) if d not in PIVOT_DIMENSIONS]
+    if unknown:
+        raise ValueError(f"Unknown pivot dimension(s): {', '.join(unknown)}; expected {', '.join(PIVOT_DIMENSIONS)}")
+    # Roll up once to exactly the dimensions the query touches, in canonical order
+    dims = tuple(d for d in PIVOT_DIMENSIONS if d in group_by or d in filters)
+    base = _rollup(cube, dims)
+    pos = {d: i for i, d in enumerate(dims)}
+    accepted = {pos[d]: set(vals) for d, vals in filters.items()}
+    groups: Dict[Tuple[Any, ...], Dict[str, Any]] = {}
+    for key, cell in base.items():
+        if any(key[i] not in vals for i, vals in accepted.items()):
+            continue
+        gkey = tuple(key[pos[d]] for d in group_by)
+        dst = groups.get(gkey)
+        if dst is None:
+            groups[gkey] = {"conversions": 0, "value": 0, "rows": 0, "exposures_by_ac": {}}
+            dst = groups[gkey]
+        _merge_cell(dst, cell)
+    out: List[Dict[str, Any]] = []
+    for gkey, cell in groups.items():
+        exposures = sum(cell["exposures_by_ac"].values())
+        item: Dict[str, Any] = dict(zip(group_by, gkey))
+        item.update({
+            "conversions": cell["conversions"],
+            "value": cell["value"],
+            "exposures": exposures,
+            "conversionRate": _rate(cell["conversions"], exposures),
+            "rows": cell["rows"],
+        })
+        out.append(item)
+    out.sort(key=lambda x: x["conversions"], reverse=True)
+    return out
+
+
 # -----------------------
 # Action card CSVs
 # -----------------------
@@ -248,3 +915,90 @@ def build_action_cards_csvs(data: Dict[str, Any]) -> Dict[str, str]:
         "action_cards.csv": action_cards_csv,
         "action_card_terms.csv": action_card_terms_csv,
     }
+
+
+# -----------------------
+# Columnar row encoding
+# -----------------------
+
+COLUMNAR_ENCODING = "columnar-v1"
+
+
+def _flatten_leaves(obj: Dict[str, Any], prefix: Tuple[str, ...], out: Dict[Tuple[str, ...], Any]) -> None:
+    for key, val in obj.items():
+        path = prefix + (key,)
+        if isinstance(val, dict) and val:
+            _flatten_leaves(val, path, out)
+        elif val is not None:
+            out[path] = val
+
+
+def encode_rows_columnar(rows: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Encode report rows as one array per leaf path instead of one nested object per row.
+
+    Columns whose values are all strings are dictionary-encoded into the shared
+    `strings` table (values are indexes); all-number columns are plain arrays;
+    anything else (bools, lists, empty objects, mixed types) is kept as-is.
+    Missing keys and nulls both encode as null and are dropped by the decoder,
+    so `a.b` being null, absent, or `a` being null all decode to "no a.b".
+    """
+    flat_rows = []
+    paths: Dict[Tuple[str, ...], None] = {}
+    for r in rows:
+        flat: Dict[Tuple[str, ...], Any] = {}
+        if isinstance(r, dict):
+            _flatten_leaves(r, (), flat)
+        flat_rows.append(flat)
+        paths.update(dict.fromkeys(flat))
+
+    strings: List[str] = []
+    index: Dict[str, int] = {}
+    columns = []
+    # Sorted paths make decoded objects' key order match a plain (sort_keys) JSON response
+    for path in sorted(paths):
+        values = [flat.get(path) for flat in flat_rows]
+        present = [v for v in values if v is not None]
+        if all(isinstance(v, str) for v in present):
+            kind = "str"
+            encoded = []
+            for v in values:
+                if v is None:
+                    encoded.append(None)
+                    continue
+                i = index.get(v)
+                if i is None:
+                    i = index[v] = len(strings)
+                    strings.append(v)
+                encoded.append(i)
+            values = encoded
+        elif all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in present):
+            kind = "num"
+        else:
+            kind = "raw"
+        columns.append({"path": list(path), "kind": kind, "values": values})
+    return {"encoding": COLUMNAR_ENCODING, "length": len(flat_rows), "strings": strings, "columns": columns}
+
+
+def decode_rows_columnar(encoded: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Inverse of encode_rows_columnar (nulls are not materialised)."""
+    strings = encoded.get("strings") or []
+    rows: List[Dict[str, Any]] = [{} for _ in range(int(encoded.get("length") or 0))]
+    for col in encoded.get("columns") or []:
+        path = col["path"]
+        is_str = col.get("kind") == "str"
+        for row, val in zip(rows, col["values"]):
+            if val is None:
+                continue
+            cur = row
+            for key in path[:-1]:
+                cur = cur.setdefault(key, {})
+            cur[path[-1]] = strings[val] if is_str else val
+    return rows
+
+
+def decode_report(data: Dict[str, Any]) -> Dict[str, Any]:
+    """Return data with columnar-encoded rows expanded back to a list (no-op for plain reports)."""
+    rows = data.get("rows")
+    if isinstance(rows, dict) and rows.get("encoding") == COLUMNAR_ENCODING:
+        return {**data, "rows": decode_rows_columnar(rows)}
+    return data
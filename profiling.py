@@ -0,0 +1,297 @@
+from __future__ import annotations
+
+import contextvars
+import cProfile
+import io
+import json
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+import uuid
+from collections import Counter
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+# Stage names used across the app; anything else is accepted but these are what the summaries show first.
+STAGES = ("fetch", "parse", "aggregate", "serialize")
+PROFILE_MODES = ("cprofile", "sample", "tracemalloc")
+_KEEP = 20
+_SAMPLE_INTERVAL = 0.005
+_TOP = 30
+
+_CURRENT: contextvars.ContextVar[Optional["StageTimer"]] = contextvars.ContextVar("piano_stage_timer", default=None)
+# One profiled request at a time: cProfile/tracemalloc are process-wide.
+_ACTIVE = threading.Lock()
+
+
+class StageTimer:
+    """Accumulates exclusive wall time per stage; safe to share across worker threads.
+
+    Nested stages are not double counted: time spent in an inner stage is taken
+    out of the enclosing one. Times from parallel workers add up, so the total can
+    exceed the request's wall time.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.totals: Dict[str, float] = {}
+        self.counts: Dict[str, int] = {}
+
+    def _stack(self) -> List[List[float]]:
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    @contextmanager
+    def measure(self, name: str) -> Iterator[None]:
+        stack = self._stack()
+        frame = [time.perf_counter(), 0.0]  # start, time spent in child stages
+        stack.append(frame)
+        try:
+            yield
+        finally:
+            stack.pop()
+            elapsed = time.perf_counter() - frame[0]
+            if stack:
+                stack[-1][1] += elapsed
+            with self._lock:
+                self.totals[name] = self.totals.get(name, 0.0) + elapsed - frame[1]
+                self.counts[name] = self.counts.get(name, 0) + 1
+
+    def as_dict(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            names = [s for s in STAGES if s in self.totals] + sorted(set(self.totals) - set(STAGES))
+            return {n: {"ms": round(self.totals[n] * 1000, 2), "count": self.counts[n]} for n in names}
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """Attribute the enclosed time to stage `name` when the current request is profiled; no-op otherwise."""
+    timer = _CURRENT.get()
+    if timer is None:
+        yield
+        return
+    with timer.measure(name):
+        yield
+
+
+def propagate(fn: Callable[..., Any]) -> Callable[..., Any]:
+    """Wrap fn so it sees the caller's stage timer when run on another thread (pool.submit/map)."""
+    if _CURRENT.get() is None:
+        return fn
+    ctx = contextvars.copy_context()
+
+    def run(*args: Any, **kwargs: Any) -> Any:
+        # A Context can only be entered by one thread at a time, so each call gets its own copy
+        return ctx.copy().run(fn, *args, **kwargs)
+
+    return run
+
+
+class _Sampler(threading.Thread):
+    """Samples stacks of the request thread and the app's worker threads (named piano-*)."""
+
+    def __init__(self, target_ident: int, interval: float = _SAMPLE_INTERVAL) -> None:
+        super().__init__(name="profile-sampler", daemon=True)
+        self.target_ident = target_ident
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._stop_evt = threading.Event()
+
+    def _wanted(self) -> set:
+        idents = {self.target_ident}
+        for t in threading.enumerate():
+            if t.name.startswith("piano-") and t.ident is not None:
+                idents.add(t.ident)
+        return idents
+
+    def run(self) -> None:
+        while not self._stop_evt.wait(self.interval):
+            wanted = self._wanted()
+            for ident, frame in sys._current_frames().items():
+                if ident not in wanted:
+                    continue
+                parts = []
+                while frame is not None:
+                    code = frame.f_code
+                    parts.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                    frame = frame.f_back
+                self.stacks[";".join(reversed(parts))] += 1
+            self.samples += 1
+
+    def stop(self) -> None:
+        self._stop_evt.set()
+        self.join(timeout=1.0)
+
+
+class ProfileSession:
+    """Profiles one request and writes its artifacts to out_dir/<id>.*."""
+
+    def __init__(self, *, modes: List[str], out_dir: Path, label: str) -> None:
+        self.id = time.strftime("%Y%m%dT%H%M%S") + "-" + uuid.uuid4().hex[:8]
+        self.modes = modes
+        self.out_dir = out_dir
+        self.label = label
+        self.timer = StageTimer()
+        self._token: Optional[contextvars.Token] = None
+        self._profiler: Optional[cProfile.Profile] = None
+        self._sampler: Optional[_Sampler] = None
+        self._started_tracemalloc = False
+        self._t0 = 0.0
+        self._done = False
+
+    def start(self) -> None:
+        self._token = _CURRENT.set(self.timer)
+        if "tracemalloc" in self.modes and not tracemalloc.is_tracing():
+            tracemalloc.start(10)
+            self._started_tracemalloc = True
+        if "sample" in self.modes:
+            self._sampler = _Sampler(threading.get_ident())
+            self._sampler.start()
+        if "cprofile" in self.modes:
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        self._t0 = time.perf_counter()
+
+    def finish(self) -> None:
+        """Stop collectors, write artifacts and release the profiling slot. Idempotent."""
+        if self._done:
+            return
+        self._done = True
+        try:
+            wall = time.perf_counter() - self._t0
+            if self._profiler is not None:
+                self._profiler.disable()
+            if self._sampler is not None:
+                self._sampler.stop()
+            summary: Dict[str, Any] = {
+                "id": self.id,
+                "request": self.label,
+                "modes": self.modes,
+                "wallMs": round(wall * 1000, 2),
+                "stages": self.timer.as_dict(),
+                "artifacts": [],
+            }
+            self.out_dir.mkdir(parents=True, exist_ok=True)
+            if self._profiler is not None:
+                path = self.out_dir / f"{self.id}.prof"
+                self._profiler.dump_stats(str(path))
+                summary["artifacts"].append(path.name)
+                summary["cprofile"] = _top_functions(self._profiler)
+            if self._sampler is not None:
+                path = self.out_dir / f"{self.id}.collapsed"
+                path.write_text("".join(f"{stack} {n}\n" for stack, n in self._sampler.stacks.most_common()), encoding="utf-8")
+                summary["artifacts"].append(path.name)
+                summary["sample"] = {
+                    "intervalMs": self._sampler.interval * 1000,
+                    "samples": self._sampler.samples,
+                    "top": _top_leaves(self._sampler.stacks),
+                }
+            if "tracemalloc" in self.modes and tracemalloc.is_tracing():
+                snap = tracemalloc.take_snapshot()
+                current, peak = tracemalloc.get_traced_memory()
+                path = self.out_dir / f"{self.id}.tracemalloc"
+                snap.dump(str(path))
+                summary["artifacts"].append(path.name)
+                summary["tracemalloc"] = {
+                    "currentBytes": current,
+                    "peakBytes": peak,
+                    "top": [
+                        {"where": str(st.traceback[0]), "bytes": st.size, "count": st.count}
+                        for st in snap.statistics("lineno")[:_TOP]
+                    ],
+                }
+            (self.out_dir / f"{self.id}.json").write_text(json.dumps(summary, indent=2), encoding="utf-8")
+            _prune(self.out_dir)
+        finally:
+            if self._started_tracemalloc:
+                tracemalloc.stop()
+            if self._token is not None:
+                try:
+                    _CURRENT.reset(self._token)
+                except ValueError:
+                    # finish() ran in another context (on response close); just detach the timer
+                    if _CURRENT.get() is self.timer:
+                        _CURRENT.set(None)
+            _ACTIVE.release()
+
+
+def _top_functions(profiler: cProfile.Profile) -> List[Dict[str, Any]]:
+    stats = pstats.Stats(profiler, stream=io.StringIO())
+    rows = []
+    for (filename, line, func), (cc, nc, tt, ct, _callers) in stats.stats.items():  # type: ignore[attr-defined]
+        rows.append({
+            "function": f"{func} ({os.path.basename(filename)}:{line})",
+            "calls": nc,
+            "tottimeMs": round(tt * 1000, 2),
+            "cumtimeMs": round(ct * 1000, 2),
+        })
+    rows.sort(key=lambda r: r["cumtimeMs"], reverse=True)
+    return rows[:_TOP]
+
+
+def _top_leaves(stacks: Counter) -> List[Dict[str, Any]]:
+    leaves: Counter = Counter()
+    for stack, n in stacks.items():
+        leaves[stack.rsplit(";", 1)[-1]] += n
+    return [{"function": fn, "samples": n} for fn, n in leaves.most_common(_TOP)]
+
+
+def _prune(out_dir: Path) -> None:
+    """Keep artifacts of the newest _KEEP sessions."""
+    ids = sorted({p.name.split(".", 1)[0] for p in out_dir.iterdir() if p.is_file()}, reverse=True)
+    for old in ids[_KEEP:]:
+        for p in out_dir.glob(f"{old}.*"):
+            try:
+                p.unlink()
+            except OSError:
+                pass
+
+
+def parse_modes(raw: Optional[str]) -> Optional[List[str]]:
+    """Parse an X-Profile header value ("1", "cprofile", "sample,tracemalloc", ...).
+
+    Returns None when the value names an unknown mode; "1"/"true" means cprofile.
+    """
+    items = [p.strip().lower() for p in (raw or "").split(",") if p.strip()]
+    if not items:
+        return None
+    if items in (["1"], ["true"]):
+        return ["cprofile"]
+    if any(m not in PROFILE_MODES for m in items):
+        return None
+    return sorted(set(items), key=PROFILE_MODES.index)
+
+
+def start_session(*, modes: List[str], out_dir: Path, label: str) -> Optional[ProfileSession]:
+    """Begin profiling the current request, or return None if another request is being profiled."""
+    if not _ACTIVE.acquire(blocking=False):
+        return None
+    try:
+        session = ProfileSession(modes=modes, out_dir=out_dir, label=label)
+        session.start()
+    except Exception:
+        _ACTIVE.release()
+        raise
+    return session
+
+
+def list_sessions(out_dir: Path) -> List[Dict[str, Any]]:
+    """Summaries of stored sessions, newest first (without the bulky top-N tables)."""
+    if not out_dir.is_dir():
+        return []
+    out = []
+    for path in sorted(out_dir.glob("*.json"), reverse=True):
+        try:
+            summary = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            continue
+        out.append({k: summary.get(k) for k in ("id", "request", "modes", "wallMs", "stages", "artifacts")})
+    return out
@@ -9,6 +9,8 @@
     "National Mortgage News": "DqBrRoNVmq",
     "Bond Buyer": "x2vmB6Jdyn",
   };
+  const ALL_BRANDS = '__all__';
+  const ALL_BRANDS_OPTION = `<option value="${ALL_BRANDS}">All brands</option>`;
   const form = document.getElementById('fetch-form');
   const statusEl = document.getElementById('status');
   const summary = document.getElementById('summary');
@@ -28,6 +30,7 @@
   const exposureTrends = document.getElementById('exposure-trends');
   const CHART_ENABLED = false; // temporarily disable chart while optimizing
   let exposureChart = null;
+  let exposureStream = null; // AbortController of the trends stream currently feeding the chart
   let selectedForChart = new Set(); // actionCard.id values
   let hiddenTerms = new Set(); // `${acId}|||${termName}` to hide in chart (default hidden)
   const subMetrics = document.getElementById('subscription-metrics');
@@ -64,6 +67,36 @@
     if (cs) cs.textContent = 'Token invalid or expired. Click "Connect via Browser Extension" to refresh, then try again.' + (extraMsg ? ` (${extraMsg})` : '');
   }
 
+  // Expand rows sent with encoding=columnar (one array per leaf path, strings
+  // dictionary-encoded) back into nested row objects; plain reports pass through.
+  function decodeReport(data) {
+    const enc = data && data.rows;
+    if (!enc || Array.isArray(enc) || enc.encoding !== 'columnar-v1') return data;
+    const strings = enc.strings || [];
+    const rows = new Array(enc.length || 0);
+    for (let i = 0; i < rows.length; i++) rows[i] = {};
+    (enc.columns || []).forEach(col => {
+      const path = col.path;
+      const last = path[path.length - 1];
+      const isStr = col.kind === 'str';
+      const values = col.values;
+      for (let i = 0; i < rows.length; i++) {
+        const v = values[i];
+        if (v === null || v === undefined) continue;
+        let cur = rows[i];
+        for (let p = 0; p < path.length - 1; p++) cur = cur[path[p]] || (cur[path[p]] = {});
+        cur[last] = isStr ? strings[v] : v;
+      }
+    });
+    return Object.assign({}, data, { rows });
+  }
+
+  function upstreamErrorText(json, fallback) {
+    const msg = String(json.error || fallback);
+    if (json.circuitOpen) return `Piano is unavailable right now; retry in ${json.retryAfter || 30}s. (${msg})`;
+    return msg;
+  }
+
   function setComposerStatus(msg) {
     const cs = document.getElementById('composer-status');
     if (cs) cs.textContent = msg || '';
@@ -134,7 +167,7 @@
     // Ensure auto brand dropdown has options on auto
     if (page === 'auto') {
       if (brandAuto && (!brandAuto.options || brandAuto.options.length === 0)) {
-        brandAuto.innerHTML = brandSelect ? brandSelect.innerHTML : '<option value="">— Select —</option>';
+        brandAuto.innerHTML = (brandSelect ? brandSelect.innerHTML : '<option value="">— Select —</option>') + ALL_BRANDS_OPTION;
       }
     }
   }
@@ -209,10 +242,19 @@
     }
   });
 
-  async function buildExposureSeries(loadMore=false) {
+  // Streams /api/trends/stream (NDJSON) and calls onUpdate with a fresh chart config
+  // after every slice, so the chart fills in progressively instead of waiting for the
+  // whole range. Failed slices stay at zero and are reported in the status line.
+  async function buildExposureSeries(onUpdate) {
     if (!CHART_ENABLED) return { labels: [], datasets: [] };
     if (!lastData) return { labels: [], datasets: [] };
+    // Only the newest stream may draw: abort the previous one (selection, legend or
+    // cadence changed) so its late records can't overwrite the current series
+    if (exposureStream) exposureStream.abort();
+    const controller = new AbortController();
+    exposureStream = controller;
     const cadence = getCadence();
+    const actionIds = Array.from(selectedForChart);
     const payload = {
       brand: document.getElementById('brand').value || undefined,
       expId: document.getElementById('expId').value || undefined,
@@ -220,103 +262,128 @@
       to: document.getElementById('to').value || undefined,
       bearer: document.getElementById('bearer').value || undefined,
       cadence,
-      actionCardIds: Array.from(selectedForChart),
+      actionCardIds: actionIds,
     };
     let labels = [];
-    let datasets = [];
-    try {
-      const res = await fetch('/api/trends', { method: 'POST', headers: { 'Content-Type': 'application/json' }, body: JSON.stringify(payload) });
-      const json = await res.json();
-      if (json && json.ok) {
-        labels = json.labels || [];
-        // Overall series as background from totalsByPeriods
-        const groups = (lastData.totalsByPeriods && lastData.totalsByPeriods[cadence]) || [];
-        datasets.push({ label: 'All Exposures', data: groups.map(g => g.exposures || 0), borderColor: '#60a5fa', tension: 0.2, yAxisID: 'yLeft' });
-        // Selected actions
-        const actions = json.actions || {};
-        Object.entries(actions).forEach(([acId, arr], idx) => {
-          datasets.push({ label: `Action ${acId}`, data: arr, borderColor: '#f59e0b', borderDash: [5,3], tension: 0, yAxisID: 'yLeft' });
+    const actions = {}; // acId -> [exposures per slice]
+    const terms = {}; // acId -> { termName -> [conversions per slice] }
+    const failedSlices = [];
+
+    function snapshot() {
+      const datasets = [];
+      // Overall series as background from totalsByPeriods
+      const groups = (lastData.totalsByPeriods && lastData.totalsByPeriods[cadence]) || [];
+      datasets.push({ label: 'All Exposures', data: groups.map(g => g.exposures || 0), borderColor: '#60a5fa', tension: 0.2, yAxisID: 'yLeft' });
+      // Selected actions
+      Object.entries(actions).forEach(([acId, arr]) => {
+        datasets.push({ label: `Action ${acId}`, data: arr.slice(), borderColor: '#f59e0b', borderDash: [5,3], tension: 0, yAxisID: 'yLeft' });
+      });
+      // Terms per action
+      const colors = ['#10b981','#ef4444','#8b5cf6','#22d3ee','#eab308','#f472b6','#34d399','#a3e635'];
+      let colorIdx = 0;
+      Object.entries(terms).forEach(([acId, termMap]) => {
+        Object.entries(termMap || {}).forEach(([termName, series]) => {
+          const key = `${acId}|||${termName}`;
+          if (hiddenTerms.size === 0) { hiddenTerms.add(key); } // default hidden
+          if (hiddenTerms.has(key)) return; // skip hidden terms
+          const color = colors[colorIdx % colors.length];
+          colorIdx += 1;
+          datasets.push({ label: `${acId}: ${termName} (conv)`, data: series.slice(), borderColor: color, tension: 0, yAxisID: 'yRight' });
         });
-        // Terms per action
-        const terms = json.terms || {};
-        const colors = ['#10b981','#ef4444','#8b5cf6','#22d3ee','#eab308','#f472b6','#34d399','#a3e635'];
-        let colorIdx = 0;
-        Object.entries(terms).forEach(([acId, termMap]) => {
-          Object.entries(termMap || {}).forEach(([termName, series]) => {
-            const key = `${acId}|||${termName}`;
-            if (hiddenTerms.size === 0) { hiddenTerms.add(key); } // default hidden
-            if (hiddenTerms.has(key)) return; // skip hidden terms
-            const color = colors[colorIdx % colors.length];
-            colorIdx += 1;
-            datasets.push({ label: `${acId}: ${termName} (conv)`, data: series, borderColor: color, tension: 0, yAxisID: 'yRight' });
+      });
+      return { labels, datasets };
+    }
+
+    function applyRecord(rec) {
+      if (controller.signal.aborted) return;
+      if (rec.type === 'meta') {
+        labels = rec.labels || [];
+        actionIds.forEach(acId => { actions[acId] = new Array(labels.length).fill(0); terms[acId] = {}; });
+      } else if (rec.type === 'slice') {
+        Object.entries(rec.actions || {}).forEach(([acId, exp]) => {
+          if (!actions[acId]) actions[acId] = new Array(labels.length).fill(0);
+          actions[acId][rec.index] = exp || 0;
+        });
+        Object.entries(rec.terms || {}).forEach(([acId, termMap]) => {
+          if (!terms[acId]) terms[acId] = {};
+          Object.entries(termMap || {}).forEach(([termName, conv]) => {
+            if (!terms[acId][termName]) terms[acId][termName] = new Array(labels.length).fill(0);
+            terms[acId][termName][rec.index] = conv || 0;
           });
         });
-        // Render legend chips for terms
-        renderTermLegend(terms);
-        // Show or hide the "load more" note for daily cadence
-        const note = document.getElementById('trends-note');
-        if (cadence === 'days' && json.truncated) note.classList.remove('hidden'); else note.classList.add('hidden');
+      } else if (rec.type === 'error') {
+        failedSlices.push(rec.label);
+        if (rec.tokenInvalid) markComposerTokenInvalid(rec.error);
+      } else if (rec.type === 'summary') {
+        if (rec.aborted === 'token_invalid') setStatus('Trends stopped: Piano rejected the token.');
+        else if (failedSlices.length) setStatus(`Trends: ${failedSlices.length} of ${rec.slices} slices failed (${failedSlices.join(', ')})`);
+        return;
+      }
+      if (onUpdate && rec.type !== 'error') onUpdate(snapshot());
+    }
+
+    try {
+      const res = await fetch('/api/trends/stream', { method: 'POST', headers: { 'Content-Type': 'application/json' }, body: JSON.stringify(payload), signal: controller.signal });
+      if (!res.ok || !res.body) {
+        const json = await res.json().catch(() => ({}));
+        if (res.status === 401 || json.tokenInvalid) markComposerTokenInvalid(json.error);
+        throw new Error(upstreamErrorText(json, 'Trends request failed'));
       }
+      const reader = res.body.getReader();
+      const decoder = new TextDecoder();
+      let buffered = '';
+      while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffered += decoder.decode(value, { stream: true });
+        let nl;
+        while ((nl = buffered.indexOf('\n')) >= 0) {
+          const lineText = buffered.slice(0, nl).trim();
+          buffered = buffered.slice(nl + 1);
+          if (lineText) applyRecord(JSON.parse(lineText));
+        }
+      }
+      if (buffered.trim()) applyRecord(JSON.parse(buffered));
+      if (controller.signal.aborted) return null;
+      // Render legend chips for terms
+      renderTermLegend(terms);
     } catch (e) {
-      // ignore
+      // A newer stream replaced this one; it owns the chart and the status line
+      if (controller.signal.aborted) return null;
+      setStatus(String(e.message || e));
+    } finally {
+      if (exposureStream === controller) exposureStream = null;
     }
-    return { labels, datasets };
+    return snapshot();
   }
 
-  async function updateExposureChart(loadMore=false) {
-    if (!CHART_ENABLED) { if (exposureTrends) exposureTrends.classList.add('hidden'); return; }
+  function renderExposureChart(cfg) {
     const ctx = document.getElementById('exposureChart');
     if (!ctx) return;
-    const cfg = await buildExposureSeries(loadMore);
+    const options = {
+      responsive: true,
+      maintainAspectRatio: false,
+      animation: false,
+      interaction: { mode: 'nearest', intersect: false },
+      scales: {
+        yLeft: { type: 'linear', position: 'left', beginAtZero: true },
+        yRight: { type: 'linear', position: 'right', beginAtZero: true, grid: { drawOnChartArea: false } }
+      }
+    };
     if (!exposureChart) {
-      exposureChart = new Chart(ctx, {
-        type: 'line',
-        data: cfg,
-        options: {
-          responsive: true,
-          maintainAspectRatio: false,
-          interaction: { mode: 'nearest', intersect: false },
-          scales: {
-            yLeft: { type: 'linear', position: 'left', beginAtZero: true },
-            yRight: { type: 'linear', position: 'right', beginAtZero: true, grid: { drawOnChartArea: false } }
-          }
-        }
-      });
+      exposureChart = new Chart(ctx, { type: 'line', data: cfg, options });
     } else {
       exposureChart.data = cfg;
-      exposureChart.options = {
-        responsive: true,
-        maintainAspectRatio: false,
-        interaction: { mode: 'nearest', intersect: false },
-        scales: {
-          yLeft: { type: 'linear', position: 'left', beginAtZero: true },
-          yRight: { type: 'linear', position: 'right', beginAtZero: true, grid: { drawOnChartArea: false } }
-        }
-      };
+      exposureChart.options = options;
       exposureChart.update();
     }
     if (cfg.labels.length) show(exposureTrends);
   }
 
-  // Load previous 14 days batching (front-end only triggers, backend uses cache and slice limits)
-  const loadMoreBtn = document.getElementById('trends-load-more');
-  if (loadMoreBtn && !loadMoreBtn._wired) {
-    loadMoreBtn._wired = true;
-    loadMoreBtn.addEventListener('click', () => {
-      // Move window back by 14 days and refresh
-      const from = document.getElementById('from');
-      const to = document.getElementById('to');
-      if (!from.value || !to.value) return;
-      const fromDate = new Date(from.value);
-      const toDate = new Date(to.value);
-      // New window: end becomes previous start - 1, start becomes end - 13
-      const newTo = new Date(fromDate.getTime() - 24*3600*1000);
-      const newFrom = new Date(newTo.getTime() - 13*24*3600*1000);
-      from.value = newFrom.toISOString().slice(0,10);
-      to.value = newTo.toISOString().slice(0,10);
-      setMinMaxDates();
-      updateExposureChart(true);
-    });
+  async function updateExposureChart() {
+    if (!CHART_ENABLED) { if (exposureTrends) exposureTrends.classList.add('hidden'); return; }
+    const cfg = await buildExposureSeries(renderExposureChart);
+    if (cfg) renderExposureChart(cfg);
   }
 
   function renderTermLegend(termsByAction) {
@@ -729,9 +796,9 @@
       // Keep existing hardcoded options on failure
     }
     brandSelect.addEventListener('change', () => { persistForm(); });
-    // Mirror options to auto brand
+    // Mirror options to auto brand, plus a fan-out option across all brands
     if (brandAuto) {
-      brandAuto.innerHTML = brandSelect.innerHTML;
+      brandAuto.innerHTML = brandSelect.innerHTML + ALL_BRANDS_OPTION;
     }
     restoreForm();
     applyUrlParams();
@@ -776,6 +843,7 @@
       from: fromInput.value || undefined,
       to: toInput.value || undefined,
       bearer: bearerInput.value.trim(),
+      encoding: 'columnar',
     };
     // Fallback to extension token if field is empty
     if (!payload.bearer) {
@@ -801,13 +869,13 @@
       });
       const json = await res.json();
       if (!json.ok) {
-        // If 502 or message indicates token issue, warn user to refresh via extension
-        if (res.status === 502 || /token|bearer|auth|unauthor/i.test(String(json.error || ''))) {
-          markComposerTokenInvalid(String(json.error || 'Bad Gateway'));
+        // Piano rejected the bearer: warn user to refresh via extension
+        if (res.status === 401 || json.tokenInvalid) {
+          markComposerTokenInvalid(String(json.error || 'Unauthorized'));
         }
-        throw new Error(json.error || 'Request failed');
+        throw new Error(upstreamErrorText(json, 'Request failed'));
       }
-      render(json.data);
+      render(decodeReport(json.data));
       setStatus('');
       updateExposureChart();
     } catch (err) {
@@ -885,11 +953,12 @@
       const aidBrand = (brandAuto && brandAuto.value) || (brandSelect && brandSelect.value) || '';
       if (!aidBrand) { setStatus('Select a brand'); return; }
       setStatus('Loading experiences...');
+      if (aidBrand === ALL_BRANDS) { loadAllBrandExperiences(); return; }
       try {
         const res = await fetch('/api/experiences', { method: 'POST', headers: { 'Content-Type': 'application/json' }, body: JSON.stringify({ brand: aidBrand }) });
         const json = await res.json();
-        if (!json.ok) throw new Error(json.error || 'Failed to load experiences');
-        renderExperiences(json.groups || {});
+        if (!json.ok) throw new Error(upstreamErrorText(json, 'Failed to load experiences'));
+        renderExperiences(json.groups || {}, [json.aid]);
         setStatus('');
       } catch (err) {
         setStatus(String(err.message || err));
@@ -897,7 +966,28 @@
     });
   }
 
-  function renderExperiences(groups) {
+  // One request fans out to every brand server-side; merge the per-brand groups
+  async function loadAllBrandExperiences() {
+    try {
+      const res = await fetch('/api/experiences/all', { method: 'POST', headers: { 'Content-Type': 'application/json' }, body: JSON.stringify({}) });
+      const json = await res.json();
+      if (!json.results) throw new Error(json.error || 'Failed to load experiences');
+      const merged = { active: [], scheduled: [], inactive: [] };
+      const failures = [];
+      Object.values(json.results).forEach(r => {
+        if (!r.ok) { failures.push(`${r.brand}: ${r.error}`); return; }
+        Object.keys(merged).forEach(st => {
+          (r.groups && r.groups[st] || []).forEach(it => merged[st].push(Object.assign({ aid: r.aid }, it)));
+        });
+      });
+      renderExperiences(merged, Object.values(json.results).filter(r => r.ok).map(r => r.aid));
+      setStatus(failures.length ? `Some brands failed — ${failures.join('; ')}` : '');
+    } catch (err) {
+      setStatus(String(err.message || err));
+    }
+  }
+
+  function renderExperiences(groups, aids) {
     const container = document.getElementById('experiences');
     const list = document.getElementById('exp-list');
     const statuses = document.getElementById('exp-statuses');
@@ -935,7 +1025,8 @@
           // Set experience title above module
           const expTitle = document.getElementById('exp-title');
           if (expTitle) { expTitle.textContent = `Experience: ${title} (${idText})`; expTitle.classList.remove('hidden'); }
-          fetchComposerData(brandAuto && brandAuto.value, idText, composerBearer, f, t);
+          const itemBrand = (brandAuto && brandAuto.value !== ALL_BRANDS && brandAuto.value) || it.aid;
+          fetchComposerData(itemBrand, idText, composerBearer, f, t);
         });
         list.appendChild(div);
       });
@@ -966,24 +1057,44 @@
       });
     });
 
-    // Search logic
+    // Search logic: queries go to the server-side index (ranked, all loaded brands);
+    // the local substring filter is only a fallback if that request fails.
     const searchEl = document.getElementById('exp-search');
+    let searchSeq = 0;
+    let searchTimer = null;
+    function localFilter(items, q) {
+      return items.filter(it => {
+        const title = (it.name || it.title || it.experienceName || it.id || it.experience_id || '').toString().toLowerCase();
+        const eid = (it.id || it.experienceId || it.experience_id || '').toString().toLowerCase();
+        return title.includes(q) || eid.includes(q);
+      });
+    }
     function applySearch() {
       const q = (searchEl && searchEl.value || '').trim().toLowerCase();
       // Collect items from all selected statuses
       const activeStatuses = selectedStatuses.size ? Array.from(selectedStatuses) : ['active','scheduled','inactive'];
       let items = [];
       activeStatuses.forEach(st => { if (groups && Array.isArray(groups[st])) items = items.concat(groups[st]); });
-      if (q) {
-        items = items.filter(it => {
-          const title = (it.name || it.title || it.experienceName || it.id || it.experience_id || '').toString().toLowerCase();
-          const eid = (it.id || it.experienceId || it.experience_id || '').toString().toLowerCase();
-          return title.includes(q) || eid.includes(q);
-        });
-      }
-      renderList(items);
+      const seq = ++searchSeq;
+      clearTimeout(searchTimer);
+      if (!q) { renderList(items); return; }
+      searchTimer = setTimeout(async () => {
+        try {
+          const res = await fetch('/api/experiences/search', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ q, brands: aids && aids.length ? aids : undefined, statuses: activeStatuses, limit: 200 })
+          });
+          const json = await res.json();
+          if (!json.ok) throw new Error(json.error || 'Search failed');
+          if (seq === searchSeq) renderList((json.hits || []).map(h => Object.assign({ aid: h.aid }, h.item)));
+        } catch {
+          if (seq === searchSeq) renderList(localFilter(items, q));
+        }
+      }, 150);
     }
-    if (searchEl) searchEl.addEventListener('input', applySearch);
+    // Assign rather than add: renderExperiences runs on every load
+    if (searchEl) searchEl.oninput = applySearch;
 
     // Default: all selected
     statuses.querySelectorAll('.status-item').forEach(b => b.classList.add('selected'));
@@ -1007,18 +1118,19 @@
       from: fromOverride || (fromInput && fromInput.value) || undefined,
       to: toOverride || (toInput && toInput.value) || undefined,
       bearer: useBearer,
+      encoding: 'columnar',
     };
     try {
       const res = await fetch('/api/report', { method: 'POST', headers: { 'Content-Type': 'application/json' }, body: JSON.stringify(params) });
       const json = await res.json();
       if (!json.ok) {
-        if (res.status === 502 || /token|bearer|auth|unauthor/i.test(String(json.error || ''))) {
-          markComposerTokenInvalid(String(json.error || 'Bad Gateway'));
+        if (res.status === 401 || json.tokenInvalid) {
+          markComposerTokenInvalid(String(json.error || 'Unauthorized'));
         }
-        throw new Error(json.error || 'Failed to fetch composer data');
+        throw new Error(upstreamErrorText(json, 'Failed to fetch composer data'));
       }
       // Render Action Card reporting inside the Automatic panel
-      renderActionCardsAuto(json.data || {});
+      renderActionCardsAuto(decodeReport(json.data || {}));
     } catch (err) {
       setStatus(String(err.message || err));
     }
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Concurrent load driver for the dashboard API.
+
+Runs a weighted mix of /api/report, /api/trends and /api/csv calls against a running
+app.py for a fixed duration and prints per-endpoint p50/p95/p99 latency, throughput
+and error counts. Pair it with tools/mock_piano.py so no real Piano calls are made.
+
+By default (--cache cold) every request uses a fresh expId, so /api/report and
+/api/trends miss the app's chunk/slice caches and the numbers reflect
+upstream-bound serving. --cache warm repeats one payload, so after the first call
+they measure cache hits.
+
+
+  python tools/mock_piano.py --port 5001 --latency-ms 300 --rate-limit 0.02 &
+  gunicorn -c gunicorn.conf.py app:app &
+  python tools/load_test.py --app http://localhost:5000 --mock http://localhost:5001 \
+      --concurrency 50 --duration 60 --mix report=5,trends=2,csv=3
+"""
+from __future__ import annotations
+
+import argparse
+import datetime as dt
+import math
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Tuple
+
+import requests
+
+
+def parse_mix(spec: str) -> List[Tuple[str, float]]:
+    mix = []
+    for part in spec.split(","):
+        name, _, weight = part.partition("=")
+        if name not in ("report", "trends", "csv"):
+            raise argparse.ArgumentTypeError(f"Unknown endpoint in mix: {name}")
+        mix.append((name, float(weight or 1)))
+    return mix
+
+
+def percentile(sorted_vals: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_vals:
+        return 0.0
+    k = max(0, min(len(sorted_vals) - 1, math.ceil(pct / 100.0 * len(sorted_vals)) - 1))
+    return sorted_vals[k]
+
+
+def cache_busted(payload: Dict[str, Any], n: int) -> Dict[str, Any]:
+    """payload with a unique expId, so the app cannot answer it from its caches."""
+    if "expId" not in payload:
+        return payload
+    return {**payload, "expId": f"{payload['expId']}-LT{n}"}
+
+
+def build_requests(args: argparse.Namespace, sample: Dict[str, Any]) -> Dict[str, Tuple[str, Dict[str, Any]]]:
+    to_date = dt.date.today()
+    from_date = to_date - dt.timedelta(days=args.days - 1)
+    common = {
+        "expId": "EXCTYT87DM0F",
+        "aid": "N8sydUSDcX",
+        "bearer": "load-test",
+        "from": from_date.isoformat(),
+        "to": to_date.isoformat(),
+        "baseUrl": f"{args.mock.rstrip('/')}/report/composer/conversion",
+    }
+    action_ids = sorted({
+        ((r.get("conversionSetMetadata") or {}).get("actionCard") or {}).get("id")
+        for r in sample.get("rows") or []
+    } - {None})[:3]
+    return {
+        "report": ("/api/report", dict(common)),
+        "trends": ("/api/trends", {**common, "cadence": "days", "extended": True, "actionCardIds": action_ids}),
+        "csv": ("/api/csv", {"data": sample}),
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Load-test the dashboard API")
+    parser.add_argument("--app", default="http://localhost:5000", help="Base URL of app.py")
+    parser.add_argument("--mock", default="http://localhost:5001", help="Base URL of tools/mock_piano.py")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--duration", type=float, default=30, help="Seconds to run")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix("report=5,trends=2,csv=3"), help="Weighted endpoint mix, e.g. report=5,trends=2,csv=3")
+    parser.add_argument("--days", type=int, default=14, help="Date range length for report/trends")
+    parser.add_argument("--timeout", type=float, default=120)
+    parser.add_argument("--cache", choices=["cold", "warm"], default="cold", help="cold: unique expId per request (upstream-bound); warm: repeat one payload (cache hits)")
+    args = parser.parse_args()
+
+    app_url = args.app.rstrip("/")
+    sample = requests.get(f"{app_url}/sampleData.json", timeout=args.timeout).json()
+    calls = build_requests(args, sample)
+    names = [n for n, _ in args.mix]
+    weights = [w for _, w in args.mix]
+
+    lock = threading.Lock()
+    latencies: Dict[str, List[float]] = {n: [] for n in names}
+    errors: Dict[str, Dict[str, int]] = {n: {} for n in names}
+    deadline = time.monotonic() + args.duration
+    counter = iter(range(1, 1 << 62))
+
+    def worker(_: int) -> None:
+        session = requests.Session()
+        rnd = random.Random()
+        while time.monotonic() < deadline:
+            name = rnd.choices(names, weights)[0]
+            path, payload = calls[name]
+            if args.cache == "cold":
+                with lock:
+                    n = next(counter)
+                payload = cache_busted(payload, n)
+            started = time.perf_counter()
+            try:
+                resp = session.post(f"{app_url}{path}", json=payload, timeout=args.timeout)
+                status = str(resp.status_code) if resp.status_code >= 400 else None
+            except requests.RequestException as exc:
+                status = type(exc).__name__
+            elapsed = time.perf_counter() - started
+            with lock:
+                latencies[name].append(elapsed)
+                if status:
+                    errors[name][status] = errors[name].get(status, 0) + 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        list(pool.map(worker, range(args.concurrency)))
+    wall = time.perf_counter() - started
+
+    total = sum(len(v) for v in latencies.values())
+    print(f"{total} requests in {wall:.1f}s with concurrency {args.concurrency} ({args.cache} cache): {total / wall:.1f} req/s")
+    print(f"{'endpoint':<10}{'count':>8}{'req/s':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}  errors")
+    for name in names:
+        vals = sorted(latencies[name])
+        errs = ", ".join(f"{k}x{v}" for k, v in sorted(errors[name].items())) or "-"
+        print(
+            f"{name:<10}{len(vals):>8}{len(vals) / wall:>9.1f}"
+            f"{percentile(vals, 50) * 1000:>10.0f}{percentile(vals, 95) * 1000:>10.0f}{percentile(vals, 99) * 1000:>10.0f}  {errs}"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the Piano APIs used by the dashboard, for load tests and offline dev.
+
+Serves, using the repo's sample files as templates:
+- GET /report/composer/conversion                   (sampleData.json)
+- GET /api/v3/publisher/experience/metadata/list    (experienceListData.json)
+
+Fault injection (flags or env):
+- --latency-ms / MOCK_LATENCY_MS     base latency per call (default 200)
+- --jitter-ms / MOCK_JITTER_MS       uniform extra latency 0..jitter (default 100)
+- --error-rate / MOCK_ERROR_RATE     fraction of calls answered 500 (default 0)
+- --rate-limit / MOCK_RATE_LIMIT     fraction of calls answered 429 (default 0)
+
+Point the app at it:
+  python tools/mock_piano.py --port 5001
+  # report/trends: send baseUrl=http://localhost:5001/report/composer/conversion in the body
+  # experiences:   PIANO_API_BASE_URL=http://localhost:5001/api/v3
+"""
+from __future__ import annotations
+
+import argparse
+import copy
+import datetime as dt
+import json
+import os
+import random
+import time
+from pathlib import Path
+from typing import Any, Dict
+
+from flask import Flask, jsonify, request
+
+ROOT = Path(__file__).resolve().parent.parent
+
+app = Flask(__name__)
+FAULTS: Dict[str, float] = {
+    "latency_ms": float(os.environ.get("MOCK_LATENCY_MS", "200")),
+    "jitter_ms": float(os.environ.get("MOCK_JITTER_MS", "100")),
+    "error_rate": float(os.environ.get("MOCK_ERROR_RATE", "0")),
+    "rate_limit": float(os.environ.get("MOCK_RATE_LIMIT", "0")),
+}
+with (ROOT / "sampleData.json").open("r", encoding="utf-8") as f:
+    REPORT_TEMPLATE: Dict[str, Any] = json.load(f)
+with (ROOT / "experienceListData.json").open("r", encoding="utf-8") as f:
+    EXPERIENCES_TEMPLATE: Dict[str, Any] = json.load(f)
+
+
+def _inject_faults():
+    """Sleep for the configured latency, then maybe return a 429/500 response."""
+    delay = FAULTS["latency_ms"] + random.uniform(0, FAULTS["jitter_ms"])
+    if delay > 0:
+        time.sleep(delay / 1000.0)
+    roll = random.random()
+    if roll < FAULTS["rate_limit"]:
+        resp = jsonify({"error": "Too Many Requests"})
+        resp.headers["Retry-After"] = "1"
+        return resp, 429
+    if roll < FAULTS["rate_limit"] + FAULTS["error_rate"]:
+        return jsonify({"error": "Injected upstream error"}), 500
+    return None
+
+
+def _report_for(aid: str, exp_id: str, from_date: str, to_date: str) -> Dict[str, Any]:
+    """Template report with params and the days series rewritten to the requested range."""
+    data = copy.deepcopy(REPORT_TEMPLATE)
+    params = data.setdefault("params", {})
+    params["aid"] = aid
+    params["experienceId"] = exp_id
+    rng = params.setdefault("dateTimeRange", {})
+    rng["startDate"], rng["endDate"] = from_date, to_date
+    template_days = (data.get("totalsByPeriods") or {}).get("days") or [{}]
+    start, end = dt.date.fromisoformat(from_date), dt.date.fromisoformat(to_date)
+    days = []
+    cur, i = start, 0
+    while cur <= end:
+        src = template_days[i % len(template_days)]
+        days.append({**src, "date": cur.isoformat()})
+        cur += dt.timedelta(days=1)
+        i += 1
+    data.setdefault("totalsByPeriods", {})["days"] = days
+    return data
+
+
+@app.get("/report/composer/conversion")
+def conversion_report():
+    if not request.headers.get("Authorization", "").startswith("Bearer "):
+        return jsonify({"error": "Unauthorized"}), 401
+    args = request.args
+    try:
+        from_date = dt.date.fromisoformat(args.get("from", "")).isoformat()
+        to_date = dt.date.fromisoformat(args.get("to", "")).isoformat()
+    except ValueError:
+        today = dt.date.today()
+        from_date, to_date = (today - dt.timedelta(days=30)).isoformat(), today.isoformat()
+    fault = _inject_faults()
+    if fault:
+        return fault
+    return jsonify(_report_for(args.get("aid", ""), args.get("expId", ""), from_date, to_date))
+
+
+@app.get("/api/v3/publisher/experience/metadata/list")
+def experience_list():
+    if not request.args.get("api_token") and not request.headers.get("Authorization"):
+        return jsonify({"code": 401, "message": "Access denied"}), 401
+    fault = _inject_faults()
+    if fault:
+        return fault
+    aid = request.args.get("aid", "")
+    data = copy.deepcopy(EXPERIENCES_TEMPLATE)
+    for item in data.get("data") or []:
+        item["aid"] = aid
+    return jsonify(data)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Mock Piano API server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5001)
+    parser.add_argument("--latency-ms", type=float, default=FAULTS["latency_ms"])
+    parser.add_argument("--jitter-ms", type=float, default=FAULTS["jitter_ms"])
+    parser.add_argument("--error-rate", type=float, default=FAULTS["error_rate"], help="Fraction of calls answered 500")
+    parser.add_argument("--rate-limit", type=float, default=FAULTS["rate_limit"], help="Fraction of calls answered 429")
+    args = parser.parse_args()
+    FAULTS.update({
+        "latency_ms": args.latency_ms,
+        "jitter_ms": args.jitter_ms,
+        "error_rate": args.error_rate,
+        "rate_limit": args.rate_limit,
+    })
+    app.run(host=args.host, port=args.port, threaded=True)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())